@@ -9,6 +9,7 @@ import cx_Oracle
 import time
 import pytz
 import logging
+import collector_profiler
 
 filename = '/home/opc/oci_usage/logs/logfile_adbs2adw_' + str(datetime.datetime.utcnow())
 logging.basicConfig(level=logging.DEBUG, filename=filename, filemode="a+",
@@ -85,6 +86,7 @@ def set_parser_arguments():
     parser.add_argument('-du', default="", dest='duser', help='ADB User')
     parser.add_argument('-dp', default="", dest='dpass', help='ADB Password')
     parser.add_argument('-dn', default="", dest='dname', help='ADB Name')
+    collector_profiler.add_profiler_arguments(parser)
     
 
     result = parser.parse_args()
@@ -345,4 +347,4 @@ def main_process():
 ##########################################################################
 # Execute Main Process
 ##########################################################################
-main_process()
\ No newline at end of file
+collector_profiler.run_profiled(main_process, "adbs2adw")
\ No newline at end of file
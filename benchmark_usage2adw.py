@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+##########################################################################
+# Copyright (c) 2016, 2020, Oracle and/or its affiliates.  All rights reserved.
+# This software is dual-licensed to you under the Universal Permissive License (UPL) 1.0 as shown at https://oss.oracle.com/licenses/upl or Apache License 2.0 as shown at http://www.apache.org/licenses/LICENSE-2.0. You may choose either license.
+#
+# benchmark_usage2adw.py
+#
+# Supports Python 3 and above
+#
+# coding: utf-8
+##########################################################################
+# Benchmark the usage2adw.py ingest of the report files created by
+# create_usage_reports.py, without a tenancy or a database:
+#
+# download  - object read from a local Object Storage stand-in to the work dir
+# parse     - gunzip and csv parse of the downloaded files
+# transform - usage2adw transform of the parsed rows
+# insert    - usage2adw load of the transformed rows to a stand-in connection
+#             which counts the rows, the database time is not measured
+# end2end   - usage2adw load_report_files of all the files with --workers
+#             and --processes, the same path as a load from Object Storage
+#
+# rows/s, MB/s of the compressed files and peak memory are printed per
+# stage, peak memory is the peak RSS of the stage, of the benchmark process
+# and the --processes transform processes summed, or the peak of the Python
+# allocations of the stage with --memory (tracemalloc, slower timings)
+# the peak RSS is reset per stage by /proc/<pid>/clear_refs on Linux, where
+# it is not available the process peak so far is printed as Peak MB (run)
+#
+# python3 create_usage_reports.py -o ./synthetic_reports
+# python3 benchmark_usage2adw.py -i ./synthetic_reports
+##########################################################################
+import argparse
+import contextlib
+import datetime
+import concurrent.futures
+import multiprocessing
+import re
+import tracemalloc
+import resource
+import time
+import gzip
+import os
+import csv
+import json
+import usage2adw
+
+version = "20.05.18"
+
+
+##########################################################################
+# Local Object Storage stand-in - get_object of the files in the report dir
+# as the bucket, the data is read with raw.stream like the OCI response
+##########################################################################
+class LocalObjectStream(object):
+    def __init__(self, path_filename):
+        self.file = open(path_filename, 'rb')
+
+    def stream(self, chunk_size, decode_content=False):
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+
+
+class LocalObjectStorage(object):
+    def __init__(self, report_dir):
+        self.report_dir = report_dir
+
+    def get_object(self, namespace_name, bucket_name, object_name):
+        response = argparse.Namespace()
+        response.data = argparse.Namespace(raw=LocalObjectStream(usage2adw.get_replay_file(self.report_dir, object_name)))
+        return response
+
+
+##########################################################################
+# Stand-in connection - accepts the statements of the load and counts the
+# rows bound to the prepared report inserts
+##########################################################################
+class StandInCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.statement = ""
+
+    def prepare(self, sql):
+        self.statement = sql
+
+    def setinputsizes(self, *args, **kwargs):
+        pass
+
+    def execute(self, sql, params=None, **kwargs):
+        self.connection.statements += 1
+
+    def executemany(self, sql, data, **kwargs):
+        self.connection.statements += 1
+        if sql is None and self.statement.startswith("INSERT"):
+            self.connection.rows += len(data)
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class StandInConnection(object):
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.commits = 0
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+##########################################################################
+# Print header centered
+##########################################################################
+def print_header(name, category):
+    options = {0: 90, 1: 60, 2: 30}
+    chars = int(options[category])
+    print("")
+    print('#' * chars)
+    print("#" + name.center(chars - 2, " ") + "#")
+    print('#' * chars)
+
+
+##########################################################################
+# set parser
+##########################################################################
+def set_parser_arguments():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-i', default="./synthetic_reports", dest='dir', help='Dir of the reports created by create_usage_reports.py (default ./synthetic_reports)')
+    parser.add_argument('-r', default="usage,cost", dest='reports', help='Reports to benchmark, usage and/or cost (default usage,cost)')
+    parser.add_argument('--workers', default=1, type=int, dest='workers', help='usage2adw --workers of the end2end stage (default 1)')
+    parser.add_argument('--processes', default=0, type=int, dest='processes', help='usage2adw --processes of the transform and end2end stages (default 0)')
+    parser.add_argument('--batch-size', default=10000, type=int, dest='batch_size', help='usage2adw --batch-size (default 10000)')
+    parser.add_argument('--stream', action='store_true', default=False, dest='stream', help='usage2adw --stream for the end2end stage')
+    parser.add_argument('--memory', action='store_true', default=False, dest='memory', help='Measure the peak Python memory of each stage with tracemalloc, slows the stages')
+    parser.add_argument('--json', default="", dest='json', help='Write the results to this json file')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + version)
+
+    return parser.parse_args()
+
+
+##########################################################################
+# Get usage2adw options of the benchmark
+##########################################################################
+def get_load_options(cmd):
+    return argparse.Namespace(
+        workers=cmd.workers,
+        processes=cmd.processes,
+        batch_size=cmd.batch_size,
+        stream=cmd.stream,
+        backfill=False,
+        partitioned=False,
+        cache_dir="",
+        replay_dir="",
+        fileid="",
+        filedate=""
+    )
+
+
+##########################################################################
+# Stage Processes - the benchmark process and the transform processes
+##########################################################################
+def get_stage_pids():
+    return [os.getpid()] + [p.pid for p in multiprocessing.active_children()]
+
+
+##########################################################################
+# Reset Peak RSS of the processes, returns False if it is not supported
+##########################################################################
+def reset_peak_rss():
+    try:
+        for pid in get_stage_pids():
+            with open("/proc/" + str(pid) + "/clear_refs", 'w') as f:
+                f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+##########################################################################
+# Peak RSS of the processes since the reset, in MB, VmHWM is in kilobytes
+##########################################################################
+def get_peak_rss_mb():
+    peak_kb = 0
+    for pid in get_stage_pids():
+        try:
+            with open("/proc/" + str(pid) + "/status", 'r') as f:
+                match = re.search(r'^VmHWM:\s+(\d+) kB', f.read(), re.MULTILINE)
+        except OSError:
+            continue
+        if match:
+            peak_kb += int(match.group(1))
+    return peak_kb / 1024.0
+
+
+##########################################################################
+# Run Stage - run the stage function and measure time and peak memory
+# returns the result of the stage with rows, bytes, seconds and MB
+##########################################################################
+def run_stage(name, report, stage, cmd):
+    stage_peak = False
+    if cmd.memory:
+        tracemalloc.start()
+    else:
+        stage_peak = reset_peak_rss()
+
+    # the load messages of usage2adw are not part of the benchmark output
+    start_time = time.time()
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            num_rows, num_bytes = stage()
+    seconds = time.time() - start_time
+
+    if cmd.memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024.0 / 1024.0
+        tracemalloc.stop()
+    elif stage_peak:
+        peak_mb = get_peak_rss_mb()
+    else:
+        # ru_maxrss is the process peak so far, in kilobytes on Linux
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    result = {
+        'report': report,
+        'stage': name,
+        'rows': num_rows,
+        'bytes': num_bytes,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(num_rows / seconds, 1) if seconds > 0 else 0,
+        'mb_per_sec': round(num_bytes / 1024.0 / 1024.0 / seconds, 2) if seconds > 0 else 0,
+        'peak_mb': round(peak_mb, 1),
+        'peak': "python" if cmd.memory else ("stage" if stage_peak else "run")
+    }
+
+    print("   " + report.ljust(8) + name.ljust(10) + str(num_rows).rjust(10) + str(result['seconds']).rjust(10) +
+          str(result['rows_per_sec']).rjust(12) + str(result['mb_per_sec']).rjust(10) + str(result['peak_mb']).rjust(10) +
+          ("" if result['peak'] != "run" else " (run)"))
+    return result
+
+
+##########################################################################
+# Benchmark Report - run the stages of one report type
+##########################################################################
+def benchmark_report(report, cmd, load_cmd, tenancy, compartments):
+    transform = usage2adw.transform_usage_rows if report == "usage" else usage2adw.transform_cost_rows
+    read_file = usage2adw.read_usage_file if report == "usage" else usage2adw.read_cost_file
+    load_file = usage2adw.load_usage_file if report == "usage" else usage2adw.load_cost_file
+
+    object_storage = LocalObjectStorage(cmd.dir)
+    objects = usage2adw.list_replay_objects(cmd.dir, "reports/" + report + "-csv/", "")
+    total_bytes = sum(o.size for o in objects)
+    work_files = [usage2adw.work_report_dir + "/benchmark_" + o.name.rsplit('/', 1)[-1] for o in objects]
+    parsed = []
+    transformed = []
+    results = []
+
+    def download():
+        metrics = usage2adw.new_file_metrics()
+        for o, work_file in zip(objects, work_files):
+            usage2adw.download_report_file(object_storage.get_object(usage2adw.usage_report_namespace, str(tenancy.id), o.name), work_file, metrics)
+        return 0, metrics['bytes']
+
+    def parse():
+        num_rows = 0
+        for work_file in work_files:
+            with gzip.open(work_file, 'rt') as file_in:
+                rows = list(csv.reader(file_in))
+            parsed.append(rows)
+            num_rows += len(rows) - 1
+        return num_rows, total_bytes
+
+    def transform_rows():
+        num_rows = 0
+        for o, rows in zip(objects, parsed):
+            file_id = o.name.rsplit('/', 1)[-1][:-7]
+            file_summary = usage2adw.new_report_summary()
+            data = list(usage2adw.transform_report_rows(transform, iter(rows[1:]), (str(tenancy.name), file_id, rows[0]), compartments, file_summary, load_cmd))
+            transformed.append((o, data, file_summary))
+            num_rows += len(data)
+        return num_rows, total_bytes
+
+    def insert():
+        connection = StandInConnection()
+        for o, data, file_summary in transformed:
+            batches = [data[i:i + cmd.batch_size] for i in range(0, len(data), cmd.batch_size)]
+            load_file(connection, o, batches, file_summary, set(), tenancy, load_cmd)
+        return connection.rows, total_bytes
+
+    def end2end():
+        connection = StandInConnection()
+        run_summary = usage2adw.new_report_summary()
+        usage2adw.load_report_files(connection, object_storage, objects, "", load_cmd, tenancy, compartments, read_file, load_file, run_summary)
+        return connection.rows, total_bytes
+
+    try:
+        results.append(run_stage("download", report, download, cmd))
+        results.append(run_stage("parse", report, parse, cmd))
+        results.append(run_stage("transform", report, transform_rows, cmd))
+        del parsed[:]
+        results.append(run_stage("insert", report, insert, cmd))
+        del transformed[:]
+        results.append(run_stage("end2end", report, end2end, cmd))
+
+    finally:
+        for work_file in work_files:
+            if os.path.exists(work_file):
+                os.remove(work_file)
+
+    return results
+
+
+##########################################################################
+# Main
+##########################################################################
+def main_process():
+    cmd = set_parser_arguments()
+
+    print_header("Benchmark usage2adw ingest", 0)
+    print("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    print("Report Dir : " + cmd.dir)
+    print("Workers    : " + str(cmd.workers) + ", Processes : " + str(cmd.processes) + ", Batch Size : " + str(cmd.batch_size))
+
+    # compartments of the synthetic reports, as indexed by usage2adw
+    compartments = {}
+    compartments_file = os.path.join(cmd.dir, "compartments.json")
+    if os.path.exists(compartments_file):
+        with open(compartments_file, 'r') as f:
+            for c in json.load(f):
+                compartments[c['id']] = c
+
+    tenancy = argparse.Namespace(id="ocid1.tenancy.oc1..synthetic", name="synthetic")
+    load_cmd = get_load_options(cmd)
+
+    results = []
+    try:
+        if cmd.processes > 0:
+            usage2adw.transform_pool = concurrent.futures.ProcessPoolExecutor(max_workers=cmd.processes, mp_context=multiprocessing.get_context("spawn"))
+
+        print("")
+        print("   " + "Report".ljust(8) + "Stage".ljust(10) + "Rows".rjust(10) + "Seconds".rjust(10) + "Rows/s".rjust(12) + "MB/s".rjust(10) + "Peak MB".rjust(10))
+        for report in cmd.reports.split(","):
+            results.extend(benchmark_report(report.strip(), cmd, load_cmd, tenancy, compartments))
+
+    finally:
+        usage2adw.shutdown_transform_pool()
+
+    if cmd.json:
+        with open(cmd.json, 'w') as f:
+            json.dump({'options': vars(cmd), 'results': results}, f, indent=1)
+        print("\nResults saved to " + cmd.json)
+
+    print("\nCompleted at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+##########################################################################
+# Execute Main Process
+##########################################################################
+if __name__ == "__main__":
+    main_process()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+##########################################################################
+# Copyright (c) 2016, 2020, Oracle and/or its affiliates.  All rights reserved.
+# This software is dual-licensed to you under the Universal Permissive License (UPL) 1.0 as shown at https://oss.oracle.com/licenses/upl or Apache License 2.0 as shown at http://www.apache.org/licenses/LICENSE-2.0. You may choose either license.
+#
+# collector_profiler.py
+#
+# Supports Python 3 and above
+#
+# coding: utf-8
+##########################################################################
+# Opt-in profiler of the collector scripts, used by usage2adw.py,
+# adbs2adw.py, compute2adb.py, dsns2adb.py, users2adw.py and
+# compartments2adw.py:
+#
+# --profile cprofile - deterministic profile of all the threads, a profiler
+#                      per thread merged at the end, Python 3.12 and later
+#                      allow a single profiler, threaded scripts are refused
+#   <script>_<tenant>_<timestamp>.prof - pstats file (python3 -m pstats)
+#   <script>_<tenant>_<timestamp>.txt  - top functions by cumulative time
+#
+# --profile sample   - periodic stack samples of all the threads, low
+#                      overhead for long runs, --profile-interval seconds
+#   <script>_<tenant>_<timestamp>.folded - collapsed stacks for flamegraph.pl
+#   <script>_<tenant>_<timestamp>.txt    - top functions by samples
+#
+# files are written to --profile-dir, tenant is the -t profiles of the run
+# and the name of the --profiles-file
+# processes of the usage2adw.py --processes pool are not profiled
+##########################################################################
+import argparse
+import collections
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+
+profile_modes = ["cprofile", "sample"]
+profile_dir = os.curdir + "/profile_dir"
+
+
+##########################################################################
+# Add the profiler options to the parser of the script
+##########################################################################
+def add_profiler_arguments(parser):
+    parser.add_argument('--profile', default="", choices=profile_modes, dest='profile_mode', help='Profile the run, cprofile or sample (periodic stack sampler)')
+    parser.add_argument('--profile-dir', default=profile_dir, dest='profile_dir', help='Dir of the profile files (default ' + profile_dir + ')')
+    parser.add_argument('--profile-interval', default=0.01, type=float, dest='profile_interval', help='Seconds between stack samples of --profile sample (default 0.01)')
+
+
+##########################################################################
+# Get the profiler options and the tenant of the command line, the other
+# options are parsed by the script
+##########################################################################
+def get_profiler_options(argv):
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('-t', action='append', default=[], dest='tenants')
+    parser.add_argument('--profiles-file', default="", dest='profiles_file')
+    parser.add_argument('-ip', action='store_true', default=False, dest='instance_principals')
+    add_profiler_arguments(parser)
+    options, unknown = parser.parse_known_args(argv)
+    return options
+
+
+##########################################################################
+# Get profile file prefix - script, tenant and timestamp of the run
+##########################################################################
+def get_profile_file_prefix(script_name, options):
+    if options.instance_principals:
+        tenant = "instance_principals"
+    else:
+        tenants = [t for t in options.tenants if t]
+        if options.profiles_file:
+            tenants.append(os.path.splitext(os.path.basename(options.profiles_file))[0])
+        tenant = "-".join(tenants) or "DEFAULT"
+    tenant = re.sub(r'[^A-Za-z0-9_.-]', '_', tenant)
+    timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+
+    if not os.path.exists(options.profile_dir):
+        os.makedirs(options.profile_dir)
+    return os.path.join(options.profile_dir, script_name + "_" + tenant + "_" + timestamp)
+
+
+##########################################################################
+# Stack Sampler - thread which counts the stacks of the other threads
+# every interval seconds, stacks are kept collapsed as
+# thread;file:function;file:function
+##########################################################################
+class StackSampler(object):
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        sampler_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = dict((t.ident, t.name) for t in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(os.path.basename(frame.f_code.co_filename) + ":" + frame.f_code.co_name)
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    ##########################################################################
+    # Save the collapsed stacks and the top functions by samples
+    ##########################################################################
+    def save(self, file_prefix, top=50):
+        with open(file_prefix + ".folded", 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(stack + " " + str(count) + "\n")
+
+        # a function is counted once per stack, as own (top frame) and total samples
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for function in set(frames):
+                total[function] += count
+
+        with open(file_prefix + ".txt", 'w') as f:
+            f.write("Samples " + str(self.samples) + ", interval " + str(self.interval) + " seconds\n\n")
+            f.write("Total".rjust(10) + "Own".rjust(10) + "  Function\n")
+            for function, count in total.most_common(top):
+                f.write(str(count).rjust(10) + str(own[function]).rjust(10) + "  " + function + "\n")
+
+
+##########################################################################
+# Threads Profiler - a cProfile profiler per thread, the threads started
+# after start() enable their own profiler on their first profile event
+##########################################################################
+class ThreadsProfiler(object):
+    def __init__(self):
+        self.profilers = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.setprofile(self.start_thread)
+        self.start_thread()
+
+    def start_thread(self, *args):
+        profiler = cProfile.Profile()
+        with self.lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    ##########################################################################
+    # Stop - called by the main thread when the other threads are done,
+    # its profiler is the first of the list
+    ##########################################################################
+    def stop(self):
+        threading.setprofile(None)
+        self.profilers[0].disable()
+
+
+##########################################################################
+# Save the cProfile stats of the profilers merged and the top functions
+# by cumulative time
+##########################################################################
+def save_cprofile(profilers, file_prefix, top=50):
+    output = io.StringIO()
+    stats = pstats.Stats(*profilers, stream=output)
+    stats.dump_stats(file_prefix + ".prof")
+
+    stats.sort_stats("cumulative").print_stats(top)
+    with open(file_prefix + ".txt", 'w') as f:
+        f.write(output.getvalue())
+
+
+##########################################################################
+# Run Profiled - run main_process of the script with the profiler of the
+# --profile option, the profile is saved also if the run failed
+# threaded is set by the scripts which run worker threads
+##########################################################################
+def run_profiled(main_process, script_name, threaded=False):
+    options = get_profiler_options(sys.argv[1:])
+    if not options.profile_mode:
+        return main_process()
+
+    # cProfile of Python 3.12 and later is a single sys.monitoring tool
+    if options.profile_mode == "cprofile" and threaded and sys.version_info >= (3, 12):
+        print("\n--profile cprofile profiles a single thread on Python 3.12 and later, use --profile sample for " + script_name)
+        raise SystemExit
+
+    file_prefix = get_profile_file_prefix(script_name, options)
+
+    if options.profile_mode == "cprofile":
+        profiler = ThreadsProfiler()
+        profiler.start()
+        try:
+            return main_process()
+        finally:
+            profiler.stop()
+            save_cprofile(profiler.profilers, file_prefix)
+            print("\nProfile saved to " + file_prefix + ".prof")
+
+    sampler = StackSampler(options.profile_interval)
+    sampler.start()
+    try:
+        return main_process()
+    finally:
+        sampler.stop()
+        sampler.save(file_prefix)
+        print("\nProfile saved to " + file_prefix + ".folded")
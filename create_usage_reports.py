@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+##########################################################################
+# Copyright (c) 2016, 2020, Oracle and/or its affiliates.  All rights reserved.
+# This software is dual-licensed to you under the Universal Permissive License (UPL) 1.0 as shown at https://oss.oracle.com/licenses/upl or Apache License 2.0 as shown at http://www.apache.org/licenses/LICENSE-2.0. You may choose either license.
+#
+# create_usage_reports.py
+#
+# Supports Python 3 and above
+#
+# coding: utf-8
+##########################################################################
+# Synthetic Usage and Cost Reports:
+#
+# Create usage-csv and cost-csv gzip files in the layout of the usage
+# report bucket, to be loaded by usage2adw.py --replay-dir or measured
+# by benchmark_usage2adw.py without a tenancy or a database
+#
+# Output:
+# - DIR/usage-csv/<file_id>.csv.gz
+# - DIR/cost-csv/<file_id>.csv.gz
+# - DIR/compartments.json - id, name and path of the compartments used
+#
+##########################################################################
+import argparse
+import datetime
+import gzip
+import os
+import csv
+import json
+import random
+
+version = "20.05.18"
+
+# report columns before the tag columns, in the order of the OCI reports
+usage_report_header = [
+    'lineItem/referenceNo',
+    'lineItem/tenantId',
+    'lineItem/intervalUsageStart',
+    'lineItem/intervalUsageEnd',
+    'product/service',
+    'product/resource',
+    'product/compartmentId',
+    'product/compartmentName',
+    'product/region',
+    'product/availabilityDomain',
+    'product/resourceId',
+    'usage/consumedQuantity',
+    'usage/billedQuantity',
+    'usage/consumedQuantityUnits',
+    'usage/consumedQuantityMeasure',
+    'lineItem/isCorrection',
+    'lineItem/backreferenceNo',
+]
+
+cost_report_header = [
+    'lineItem/referenceNo',
+    'lineItem/tenantId',
+    'lineItem/intervalUsageStart',
+    'lineItem/intervalUsageEnd',
+    'product/service',
+    'product/compartmentId',
+    'product/compartmentName',
+    'product/region',
+    'product/availabilityDomain',
+    'product/resourceId',
+    'usage/billedQuantity',
+    'usage/billedQuantityOverage',
+    'cost/subscriptionId',
+    'cost/productSku',
+    'product/Description',
+    'cost/unitPrice',
+    'cost/unitPriceOverage',
+    'cost/myCost',
+    'cost/myCostOverage',
+    'cost/currencyCode',
+    'cost/billingUnitReadable',
+    'cost/skuUnitDescription',
+    'cost/overageFlag',
+    'lineItem/isCorrection',
+    'lineItem/backreferenceNo',
+]
+
+# service, resource, unit, measure, resource ocid type
+report_services = [
+    ("COMPUTE", "PIC_COMPUTE_STANDARD_E2", "OCPU_HOURS", "HOURS", "instance"),
+    ("COMPUTE", "PIC_COMPUTE_VM_STANDARD", "OCPU_HOURS", "HOURS", "instance"),
+    ("BLOCK_STORAGE", "PIC_BLOCK_STORAGE_STANDARD", "GB_MONTHS", "BYTE_MS", "volume"),
+    ("BLOCK_STORAGE", "PIC_BLOCK_STORAGE_BACKUP", "GB_MONTHS", "BYTE_MS", "volumebackup"),
+    ("OBJECT_STORAGE", "PIC_OBJECT_STORAGE_TIER_STANDARD", "GB_MONTHS", "BYTE_MS", "bucket"),
+    ("NETWORK", "PIC_COMPUTE_OUTBOUND_DATA_TRANSFER", "GB", "BYTES", "vnic"),
+    ("DATABASE", "PIC_ADWC_OCPU_LICENSE_INCLUDED", "OCPU_HOURS", "HOURS", "autonomousdatabase"),
+    ("DATABASE", "PIC_ADW_EXADATA_STORAGE", "TB_MONTHS", "BYTE_MS", "autonomousdatabase"),
+]
+
+# sku, description, billing unit, unit price - empty descriptions are fixed by usage2adw.py
+report_skus = [
+    ("B88514", "Compute - Virtual Machine Standard - X7", "OCPU Per Hour", "0.0638"),
+    ("B90425", "Compute - Standard - E2", "OCPU Per Hour", "0.03"),
+    ("B91961", "Block Volume - Storage", "Gigabyte Storage Capacity Per Month", "0.0255"),
+    ("B91962", "Block Volume - Performance Units", "Performance Units Per Gigabyte Per Month", "0.0017"),
+    ("B91628", "Object Storage - Storage", "Gigabyte Storage Capacity Per Month", "0.0255"),
+    ("B88327", "Outbound Data Transfer", "Gigabyte Outbound Data Transfer Per Month", "0.0085"),
+    ("B89039", "Autonomous Data Warehouse", "OCPU Per Hour", "1.3441"),
+    ("B89040", "Autonomous Data Warehouse - Exadata Storage", "Terabyte Storage Capacity Per Month", "118.40"),
+    ("B88285", "", "", "0.0255"),
+    ("B88284", "", "", "0.0034"),
+    ("B88269", "", "", "0.0638"),
+]
+
+report_regions = [("us-ashburn-1", "iad"), ("us-phoenix-1", "phx"), ("eu-frankfurt-1", "fra"), ("uk-london-1", "lhr")]
+
+
+##########################################################################
+# Print header centered
+##########################################################################
+def print_header(name, category):
+    options = {0: 90, 1: 60, 2: 30}
+    chars = int(options[category])
+    print("")
+    print('#' * chars)
+    print("#" + name.center(chars - 2, " ") + "#")
+    print('#' * chars)
+
+
+##########################################################################
+# set parser
+##########################################################################
+def set_parser_arguments():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-o', default="./synthetic_reports", dest='dir', help='Output dir (default ./synthetic_reports)')
+    parser.add_argument('--files', default=24, type=int, dest='files', help='Number of usage and cost files, one per hour (default 24)')
+    parser.add_argument('--usage-rows', default=10000, type=int, dest='usage_rows', help='Rows per usage file (default 10000)')
+    parser.add_argument('--cost-rows', default=10000, type=int, dest='cost_rows', help='Rows per cost file (default 10000)')
+    parser.add_argument('--compartments', default=50, type=int, dest='compartments', help='Number of compartments (default 50)')
+    parser.add_argument('--tags', default=10, type=int, dest='tags', help='Number of tag columns (default 10)')
+    parser.add_argument('--tags-fill', default=0.5, type=float, dest='tags_fill', help='Share of the tag values which are not empty (default 0.5)')
+    parser.add_argument('--skus', default="", dest='skus', help='Comma separated SKUs to use, default all the SKUs known to the generator')
+    parser.add_argument('--seed', default=1, type=int, dest='seed', help='Random seed, the same seed creates the same files (default 1)')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + version)
+
+    return parser.parse_args()
+
+
+##########################################################################
+# Create Compartments - random tree under the root compartment
+# returns list of dict id, name and path as built by usage2adw.py
+##########################################################################
+def create_compartments(rnd, tenancy_id, num_compartments):
+    compartments = [{'id': tenancy_id, 'name': "synthetic (root)", 'path': "/ synthetic (root)"}]
+    for i in range(num_compartments):
+        parent = rnd.choice(compartments)
+        name = "compartment_" + str(i + 1)
+        compartment = {
+            'id': "ocid1.compartment.oc1..synthetic" + str(i + 1).zfill(8),
+            'name': name,
+            'path': name if parent['id'] == tenancy_id else parent['path'] + " / " + name
+        }
+        compartments.append(compartment)
+    return compartments
+
+
+##########################################################################
+# Create Tag Columns - tags/<namespace>.<key> header names
+##########################################################################
+def create_tag_columns(num_tags):
+    columns = ["tags/Oracle-Tags.CreatedBy", "tags/Oracle-Tags.CreatedOn"][:num_tags]
+    for i in range(len(columns), num_tags):
+        columns.append("tags/namespace" + str(i % 4) + ".key" + str(i))
+    return columns
+
+
+##########################################################################
+# Get tag values of a row
+##########################################################################
+def get_tag_values(rnd, tag_columns, tags_fill):
+    values = []
+    for i, column in enumerate(tag_columns):
+        if rnd.random() >= tags_fill:
+            values.append("")
+        elif column == "tags/Oracle-Tags.CreatedBy":
+            values.append("oracleidentitycloudservice/user" + str(rnd.randrange(20)) + "@example.com")
+        elif column == "tags/Oracle-Tags.CreatedOn":
+            values.append("2020-0" + str(rnd.randrange(1, 6)) + "-1" + str(rnd.randrange(10)) + "T10:00:00.000Z")
+        else:
+            values.append("value" + str(rnd.randrange(50)))
+    return values
+
+
+##########################################################################
+# Get common values of a row - time, service, compartment, region, resource
+##########################################################################
+def get_row_base(rnd, tenancy_id, interval_start, interval_end, compartments):
+    service = rnd.choice(report_services)
+    compartment = rnd.choice(compartments)
+    region, region_key = rnd.choice(report_regions)
+    availability_domain = "" if service[0] in ("OBJECT_STORAGE", "NETWORK") else region_key.upper() + "-AD-" + str(rnd.randrange(1, 4))
+    resource_id = "ocid1." + service[4] + ".oc1." + region_key + ".synthetic" + str(rnd.randrange(10000)).zfill(6)
+    return [
+        str(rnd.randrange(10 ** 9)),
+        tenancy_id,
+        interval_start,
+        interval_end,
+        service,
+        compartment,
+        region,
+        availability_domain,
+        resource_id
+    ]
+
+
+##########################################################################
+# Write gzip csv file
+##########################################################################
+def write_report_file(file_name, header, rows):
+    with gzip.open(file_name, 'wt', newline='') as f:
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(header)
+        csv_writer.writerows(rows)
+
+
+##########################################################################
+# Create Usage File
+##########################################################################
+def create_usage_file(rnd, file_name, tenancy_id, interval_start, interval_end, compartments, tag_columns, cmd):
+    rows = []
+    for i in range(cmd.usage_rows):
+        reference_no, tenant_id, start, end, service, compartment, region, availability_domain, resource_id = get_row_base(rnd, tenancy_id, interval_start, interval_end, compartments)
+        quantity = str(round(rnd.uniform(0, 100), 6))
+        row = [
+            reference_no, tenant_id, start, end,
+            service[0], service[1], compartment['id'], compartment['name'], region, availability_domain, resource_id,
+            quantity, quantity, service[2], service[3], "false", ""
+        ]
+        rows.append(row + get_tag_values(rnd, tag_columns, cmd.tags_fill))
+
+    write_report_file(file_name, usage_report_header + tag_columns, rows)
+
+
+##########################################################################
+# Create Cost File
+##########################################################################
+def create_cost_file(rnd, file_name, tenancy_id, interval_start, interval_end, compartments, tag_columns, skus, cmd):
+    rows = []
+    for i in range(cmd.cost_rows):
+        reference_no, tenant_id, start, end, service, compartment, region, availability_domain, resource_id = get_row_base(rnd, tenancy_id, interval_start, interval_end, compartments)
+        sku, description, billing_unit, unit_price = rnd.choice(skus)
+        quantity = round(rnd.uniform(0, 10), 6)
+        row = [
+            reference_no, tenant_id, start, end,
+            service[0], compartment['id'], compartment['name'], region, availability_domain, resource_id,
+            str(quantity), "", "12345678", sku, description,
+            unit_price, "", str(round(quantity * float(unit_price), 6)), "", "USD",
+            billing_unit, billing_unit, "", "false", ""
+        ]
+        rows.append(row + get_tag_values(rnd, tag_columns, cmd.tags_fill))
+
+    write_report_file(file_name, cost_report_header + tag_columns, rows)
+
+
+##########################################################################
+# Create Reports - files of cmd.files hours ending at 2020-05-01 00:00
+##########################################################################
+def create_reports(cmd):
+    rnd = random.Random(cmd.seed)
+    tenancy_id = "ocid1.tenancy.oc1..synthetic"
+
+    skus = report_skus
+    if cmd.skus:
+        selected = cmd.skus.split(",")
+        skus = [sku for sku in report_skus if sku[0] in selected]
+        if not skus:
+            raise ValueError("No known SKU in " + cmd.skus)
+
+    compartments = create_compartments(rnd, tenancy_id, cmd.compartments)
+    tag_columns = create_tag_columns(cmd.tags)
+
+    for report_dir in ("usage-csv", "cost-csv"):
+        if not os.path.exists(os.path.join(cmd.dir, report_dir)):
+            os.makedirs(os.path.join(cmd.dir, report_dir))
+
+    with open(os.path.join(cmd.dir, "compartments.json"), 'w') as f:
+        json.dump(compartments, f, indent=1)
+
+    first_hour = datetime.datetime(2020, 5, 1) - datetime.timedelta(hours=cmd.files)
+    for i in range(cmd.files):
+        hour = first_hour + datetime.timedelta(hours=i)
+        interval_start = hour.strftime("%Y-%m-%dT%H:%MZ")
+        interval_end = (hour + datetime.timedelta(hours=1)).strftime("%Y-%m-%dT%H:%MZ")
+        file_id = "0001" + str(i + 1).zfill(12)
+
+        create_usage_file(rnd, os.path.join(cmd.dir, "usage-csv", file_id + ".csv.gz"), tenancy_id, interval_start, interval_end, compartments, tag_columns, cmd)
+        create_cost_file(rnd, os.path.join(cmd.dir, "cost-csv", file_id + ".csv.gz"), tenancy_id, interval_start, interval_end, compartments, tag_columns, skus, cmd)
+        print("   Created file " + file_id + " - " + interval_start)
+
+
+##########################################################################
+# Main
+##########################################################################
+def main_process():
+    cmd = set_parser_arguments()
+
+    print_header("Creating Synthetic Usage and Cost Reports", 0)
+    print("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    print("Output Dir : " + cmd.dir)
+    print("")
+
+    create_reports(cmd)
+
+    print("\nCompleted at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+##########################################################################
+# Execute Main Process
+##########################################################################
+if __name__ == "__main__":
+    main_process()
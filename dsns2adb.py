@@ -8,6 +8,7 @@ import csv
 import cx_Oracle
 import time
 import pytz
+import collector_profiler
 
 os.putenv("TNS_ADMIN", "/home/opc/wallet/Wallet_ADWshared")
 
@@ -80,6 +81,7 @@ def set_parser_arguments():
     parser.add_argument('-du', default="", dest='duser', help='ADB User')
     parser.add_argument('-dp', default="", dest='dpass', help='ADB Password')
     parser.add_argument('-dn', default="", dest='dname', help='ADB Name')
+    collector_profiler.add_profiler_arguments(parser)
     
 
     result = parser.parse_args()
@@ -307,4 +309,4 @@ def main_process():
 ##########################################################################
 # Execute Main Process
 ##########################################################################
-main_process()
+collector_profiler.run_profiled(main_process, "dsns2adb")
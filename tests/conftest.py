@@ -0,0 +1,32 @@
+import os
+import sys
+import types
+
+# the scripts are modules of the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+##########################################################################
+# cx_Oracle and oci are not needed by the helpers under test, minimal
+# modules are used where they are not installed
+##########################################################################
+class StubError(Exception):
+    pass
+
+
+try:
+    import cx_Oracle  # noqa: F401
+except ImportError:
+    sys.modules['cx_Oracle'] = types.ModuleType('cx_Oracle')
+    sys.modules['cx_Oracle'].__dict__.update(DatabaseError=StubError, NUMBER="NUMBER", DATETIME="DATETIME", STRING="STRING")
+
+try:
+    import oci  # noqa: F401
+except ImportError:
+    sys.modules['oci'] = types.ModuleType('oci')
+    sys.modules['oci'].__dict__.update(
+        exceptions=types.SimpleNamespace(ServiceError=StubError, RequestException=StubError),
+        pagination=types.SimpleNamespace(list_call_get_all_results=None),
+        identity=types.SimpleNamespace(models=types.SimpleNamespace(Compartment=types.SimpleNamespace(LIFECYCLE_STATE_ACTIVE="ACTIVE"))),
+        config=types.SimpleNamespace(DEFAULT_LOCATION="~/.oci/config", DEFAULT_PROFILE="DEFAULT")
+    )
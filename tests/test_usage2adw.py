@@ -0,0 +1,177 @@
+##########################################################################
+# Tests of the usage2adw.py helpers which do not need a tenancy or a
+# database, run with python3 -m pytest tests
+##########################################################################
+import datetime
+import decimal
+import types
+
+import pytest
+
+import usage2adw
+
+
+def new_row(header, values):
+    return [values.get(column, "") for column in header]
+
+
+##########################################################################
+# add_cost_price - USAGE_INTERVAL_START desc, COST_UNIT_PRICE desc,
+# nulls first in descending order
+##########################################################################
+def test_add_cost_price_keeps_latest_interval():
+    prices = {}
+    may1 = datetime.datetime(2020, 5, 1, 10, 0)
+    may2 = datetime.datetime(2020, 5, 2, 10, 0)
+
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc 1", "USD", decimal.Decimal("1.5")))
+    usage2adw.add_cost_price(prices, "B1", (may2, "Desc 2", "USD", decimal.Decimal("0.5")))
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc 3", "USD", decimal.Decimal("9")))
+    assert prices["B1"] == (may2, "Desc 2", "USD", decimal.Decimal("0.5"))
+
+
+def test_add_cost_price_same_interval_higher_or_null_price():
+    prices = {}
+    may1 = datetime.datetime(2020, 5, 1, 10, 0)
+
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc", "USD", decimal.Decimal("1.5")))
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc", "USD", decimal.Decimal("2")))
+    assert prices["B1"][3] == decimal.Decimal("2")
+
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc", "USD", None))
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc", "USD", decimal.Decimal("3")))
+    assert prices["B1"][3] is None
+
+
+def test_add_cost_price_null_interval_first():
+    prices = {}
+    may1 = datetime.datetime(2020, 5, 1, 10, 0)
+
+    usage2adw.add_cost_price(prices, "B1", (None, "Desc", "USD", decimal.Decimal("1")))
+    usage2adw.add_cost_price(prices, "B1", (may1, "Desc", "USD", decimal.Decimal("2")))
+    assert prices["B1"][0] is None
+
+
+##########################################################################
+# identity_read_compartments - depth first walk of the compartments
+##########################################################################
+def test_identity_read_compartments(monkeypatch):
+    monkeypatch.setattr(usage2adw.oci.pagination, "list_call_get_all_results", lambda fn, *args, **kwargs: types.SimpleNamespace(data=fn(*args, **kwargs)))
+
+    def compartment(id, parent, name, state="ACTIVE"):
+        return types.SimpleNamespace(id=id, compartment_id=parent, name=name, lifecycle_state=state)
+
+    compartments = [
+        compartment("c", "b", "C"),
+        compartment("b", "a", "B"),
+        compartment("a", "root", "A"),
+        compartment("d", "a", "D", "DELETED"),
+        compartment("e", "d", "E"),
+        compartment("g", "root", "G")
+    ]
+    identity = types.SimpleNamespace(list_compartments=lambda *args, **kwargs: compartments)
+    tenancy = types.SimpleNamespace(id="root", name="T")
+
+    index = usage2adw.identity_read_compartments(identity, tenancy)
+
+    # active compartments in path order, then the not active and their children
+    assert list(index) == ["root", "a", "b", "c", "g", "d", "e"]
+    assert index["root"]["path"] == "/ T (root)"
+    assert index["c"]["path"] == "A / B / C"
+    assert index["e"]["path"] == "A / D / E"
+    assert usage2adw.get_compartment_path(index, "missing") == ""
+
+
+##########################################################################
+# transform_usage_rows and transform_cost_rows - blank lines are skipped
+##########################################################################
+def test_transform_usage_rows_skips_blank_rows():
+    header = usage2adw.usage_file_columns + ["tags/ns.cc"]
+    row = new_row(header, {"lineItem/intervalUsageStart": "2020-05-01T10:00Z", "usage/billedQuantity": "1.5", "tags/ns.cc": "x"})
+    file_summary = usage2adw.new_report_summary()
+
+    rows = list(usage2adw.transform_usage_rows(iter([list(row), [], list(row)]), ("T", "0001", header), {}, file_summary))
+
+    assert len(rows) == 2
+    assert rows[0][2] == datetime.datetime(2020, 5, 1, 10, 0)
+    assert rows[0][12] == decimal.Decimal("1.5")
+    assert rows[0][-1] == "#ns.cc=x#"
+    assert file_summary['stats'] == {datetime.datetime(2020, 5, 1, 10, 0): 2}
+    assert file_summary['rejects'] == []
+
+
+def test_transform_cost_rows_skips_blank_rows():
+    header = usage2adw.cost_file_columns
+    row = new_row(header, {"lineItem/intervalUsageStart": "2020-05-01T10:00Z", "cost/productSku": "B1", "product/Description": "Desc",
+                           "cost/unitPrice": "0.5", "cost/myCost": "2", "cost/currencyCode": "USD"})
+    file_summary = usage2adw.new_report_summary()
+
+    rows = list(usage2adw.transform_cost_rows(iter([[], list(row), [], list(row)]), ("T", "0001", header), {}, file_summary))
+
+    assert len(rows) == 2
+    assert file_summary['skus'] == {"B1": "Desc"}
+    assert file_summary['prices']["B1"] == (datetime.datetime(2020, 5, 1, 10, 0), "Desc", "USD", decimal.Decimal("0.5"))
+    assert file_summary['rejects'] == []
+
+
+##########################################################################
+# get_tags_data
+##########################################################################
+def test_get_tags_data():
+    header = ["lineItem/referenceNo", "tags/Oracle-Tags.CreatedBy", "tags/ns.cc", "tags/free#=x"]
+    tags_columns = usage2adw.get_report_tags_columns(header)
+    assert tags_columns == [(1, "Oracle-Tags.CreatedBy"), (2, "ns.cc"), (3, "freex")]
+
+    tags_keys = set()
+    row = ["ref", "user=#1", "", "v"]
+    assert usage2adw.get_tags_data(row, tags_columns, tags_keys) == "#Oracle-Tags.CreatedBy=user1#freex=v#"
+    assert tags_keys == {"Oracle-Tags.CreatedBy", "freex"}
+
+    assert usage2adw.get_tags_data(["ref", "", "", ""], tags_columns, tags_keys) == ""
+
+
+def test_get_tags_data_up_to_4000_chars():
+    tags_columns = [(0, "a"), (1, "b")]
+    tags_keys = set()
+    tags_data = usage2adw.get_tags_data(["x" * 3990, "y" * 100], tags_columns, tags_keys)
+    assert tags_data == "#a=" + "x" * 3990 + "#"
+    assert tags_keys == {"a"}
+
+
+##########################################################################
+# get_report_date and get_report_number
+##########################################################################
+def test_get_report_date():
+    assert usage2adw.get_report_date("2020-05-01T10:15Z") == datetime.datetime(2020, 5, 1, 10, 15)
+    assert usage2adw.get_report_date("") is None
+    with pytest.raises(ValueError):
+        usage2adw.get_report_date("2020-05-xx")
+
+
+def test_get_report_number():
+    assert usage2adw.get_report_number("12345.000001") == decimal.Decimal("12345.000001")
+    assert usage2adw.get_report_number("") is None
+    for value in ("abc", "nan", "inf"):
+        with pytest.raises(ValueError):
+            usage2adw.get_report_number(value)
+
+
+##########################################################################
+# load_sku_repairs_file
+##########################################################################
+def test_load_sku_repairs_file(tmp_path):
+    repairs_file = tmp_path / "sku_repairs.csv"
+    repairs_file.write_text("# SKU, description, billing unit\n\nB1,\"Compute, Classic\",OCPU Per Hour\n B2 ,Storage,GB Per Month\n")
+
+    assert usage2adw.load_sku_repairs_file(str(repairs_file)) == {
+        "B1": ("Compute, Classic", "OCPU Per Hour"),
+        "B2": ("Storage", "GB Per Month")
+    }
+
+
+def test_load_sku_repairs_file_malformed_line(tmp_path):
+    repairs_file = tmp_path / "sku_repairs.csv"
+    repairs_file.write_text("B1,Compute Classic\n")
+
+    with pytest.raises(ValueError):
+        usage2adw.load_sku_repairs_file(str(repairs_file))
@@ -27,6 +27,8 @@
 #     tenancy     = tenancy ocid
 #     region      = region
 #
+# several tenants can be loaded in one run, -t repeated or --profiles-file
+#
 ##########################################################################
 # Database user:
 #     create user usage identified by PaSsw0rd2#_#;
@@ -57,6 +59,10 @@
 # - OCI_COST_TAG_KEYS - Tag keys of the cost reports
 # - OCI_COST_REFERENCE - Reference table of the cost filter keys - SERVICE, REGION, COMPARTMENT, PRODUCT, SUBSCRIPTION
 # - OCI_PRICE_LIST - Hold the price list and the cost per product
+# - OCI_LOAD_FILES - Files loaded per tenant and report type, used as the restart point, and the markers of backfill files in progress
+# - OCI_USAGE_STAGE, OCI_COST_STAGE - Temporary stage of a file for the partitioned load (--partitioned)
+# - OCI_LOAD_METRICS - Time of the load stages per file (--load-metrics)
+# - OCI_SKU_REPAIRS - Product description and billing unit of SKUs without description in the cost report
 ##########################################################################
 import sys
 import argparse
@@ -67,15 +73,99 @@ import os
 import csv
 import cx_Oracle
 import requests
+import requests.adapters
 import logging
-
-filename = '/home/opc/oci_usage/logs/logfile_usage2adw_' + str(datetime.datetime.utcnow())
-logging.basicConfig(level=logging.DEBUG, filename=filename, filemode="a+",
-                    format="%(asctime)-15s %(levelname)-8s %(message)s")
+import contextlib
+import concurrent.futures
+import threading
+import queue
+import resource
+import operator
+import json
+import time
+import decimal
+import itertools
+import multiprocessing
+import pickle
+import collector_profiler
 
 version = "20.05.18"
 usage_report_namespace = "bling"
 work_report_dir = os.curdir + "/work_report_dir"
+public_rates_url = "https://itra.oraclecloud.com/itas/.anon/myservices/api/v1/products?partNumber="
+public_rates_cache_lock = threading.Lock()
+report_cache_lock = threading.Lock()
+
+# process pool of --processes, rows are transformed in the worker threads if None
+transform_pool = None
+
+# report tables which are partitioned with --partitioned, their files are loaded through the stage table
+stage_load_tables = set()
+
+# compartments of the tenants pickled once for the transform processes, file per tenant name,
+# and the compartments loaded by a transform process, per file
+transform_compartments_files = {}
+transform_compartments_lock = threading.Lock()
+transform_compartments = {}
+
+# usage report columns loaded, in the order returned by get_report_columns
+usage_file_columns = [
+    'lineItem/intervalUsageStart',
+    'lineItem/intervalUsageEnd',
+    'product/service',
+    'product/resource',
+    'product/compartmentId',
+    'product/compartmentName',
+    'product/region',
+    'product/availabilityDomain',
+    'product/resourceId',
+    'usage/billedQuantity',
+    'usage/consumedQuantity',
+    'usage/consumedQuantityUnits',
+    'usage/consumedQuantityMeasure',
+    'lineItem/isCorrection',
+]
+
+# cost report columns loaded, in the order returned by get_report_columns
+cost_file_columns = [
+    'lineItem/intervalUsageStart',
+    'lineItem/intervalUsageEnd',
+    'product/service',
+    'product/compartmentId',
+    'product/compartmentName',
+    'product/region',
+    'product/availabilityDomain',
+    'product/resourceId',
+    'usage/billedQuantity',
+    'usage/billedQuantityOverage',
+    'cost/subscriptionId',
+    'cost/productSku',
+    'product/Description',
+    'cost/unitPrice',
+    'cost/unitPriceOverage',
+    'cost/myCost',
+    'cost/myCostOverage',
+    'cost/currencyCode',
+    'cost/billingUnitReadable',
+    'cost/overageFlag',
+    'lineItem/isCorrection',
+]
+
+# product description and billing unit of the SKUs which have no product/Description
+# in the cost report, extended by --sku-repairs-file and OCI_SKU_REPAIRS
+sku_repairs = {
+    "B88285": ("Object Storage Classic", "Gigabyte Storage Capacity per Month"),
+    "B88272": ("Compute Classic - Unassociated Static IP", "IPs"),
+    "B88166": ("Oracle Identity Cloud - Standard", "Active User per Hour"),
+    "B88167": ("Oracle Identity Cloud - Basic", "Active User per Hour"),
+    "B88168": ("Oracle Identity Cloud - Basic - Consumer User", "Active User per Hour"),
+    "B88274": ("Block Storage Classic", "Gigabyte Storage Capacity per Month"),
+    "B89164": ("Oracle Security Monitoring and Compliance Edition", "100 Entities Per Hour"),
+    "B88269": ("Compute Classic", "OCPU Per Hour "),
+    "B88275": ("Block Storage Classic - High I/O", "Gigabyte Storage Per Month"),
+    "B88283": ("Object Storage Classic - GET and all other Requests", "10,000 Requests Per Month"),
+    "B88284": ("Object Storage Classic - PUT, COPY, POST or LIST Requests", "10,000 Requests Per Month"),
+}
 
 os.putenv("TNS_ADMIN", "/home/opc/wallet/Wallet_ADWshared")
 
@@ -97,11 +187,94 @@ def print_header(name, category):
 
 
 ##########################################################################
-# Get Column from Array
+# Get Columns getter from the report header
+# returns a function which extracts the columns from a row list, missing
+# columns point to the empty value appended after the last column of the row
+##########################################################################
+def get_report_columns(header, columns):
+    positions = {}
+    for position, column in enumerate(header):
+        positions[column] = position
+
+    missing = len(header)
+    return operator.itemgetter(*[positions.get(column, missing) for column in columns])
+
+
+##########################################################################
+# Get Tags Columns from the report header as (position, tag key)
+# the tag key is the column name without tags/ and the # and = characters
+##########################################################################
+def get_report_tags_columns(header):
+    tags_columns = []
+    for position, column in enumerate(header):
+        if 'tags' in column:
+            keyadj = column.replace("tags/", "").replace("#", "").replace("=", "")
+            tags_columns.append((position, keyadj))
+    return tags_columns
+
+
+##########################################################################
+# Get Report Date - report time (i.e. 2020-05-01T10:00Z) to datetime
+# truncated to the minute, empty is null, ValueError if malformed
+##########################################################################
+def get_report_date(value):
+    if value == "":
+        return None
+    try:
+        return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]))
+    except ValueError:
+        raise ValueError("malformed date '" + value + "'")
+
+
+##########################################################################
+# Get Report Number - report number to Decimal, empty is null,
+# ValueError if malformed
+##########################################################################
+def get_report_number(value):
+    if value == "":
+        return None
+    try:
+        number = decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        raise ValueError("malformed number '" + value + "'")
+    if not number.is_finite():
+        raise ValueError("malformed number '" + value + "'")
+    return number
+
+
+##########################################################################
+# Get Tags Data of a row as #key=value#key=value# up to 4000 chars
+# tag keys which were added are kept in the tags_keys set
+##########################################################################
+def get_tags_data(row, tags_columns, tags_keys):
+    tags = []
+    tags_len = 0
+    for (position, key) in tags_columns:
+        value = row[position]
+        if len(value) > 0:
+
+            # remove # and = from the tags value
+            valueadj = value.replace("#", "").replace("=", "")
+
+            # check if length < 4000 to avoid overflow database column
+            tag_len = len(key) + len(valueadj) + 2
+            if tags_len + tag_len < 4000:
+                tags_len += tag_len + (1 if tags_len == 0 else 0)
+                tags.append(key + "=" + valueadj + "#")
+                tags_keys.add(key)
+
+    if tags:
+        return "#" + "".join(tags)
+    return ""
+
+
+##########################################################################
+# Get Compartment Path from the compartments index
 ##########################################################################
-def get_column_value_from_array(column, array):
-    if column in array:
-        return array[column]
+def get_compartment_path(compartments, compartment_id):
+    compartment = compartments.get(compartment_id)
+    if compartment:
+        return compartment['path']
     else:
         return ""
 
@@ -109,7 +282,7 @@ def get_column_value_from_array(column, array):
 ##########################################################################
 # Create signer
 ##########################################################################
-def create_signer(cmd):
+def create_signer(cmd, profile=""):
 
     # assign default values
     config_file = oci.config.DEFAULT_LOCATION
@@ -119,8 +292,8 @@ def create_signer(cmd):
         if cmd.config.name:
             config_file = cmd.config.name
 
-    if cmd.profile:
-        config_section = cmd.profile
+    if profile:
+        config_section = profile
 
     if cmd.instance_principals:
         try:
@@ -165,24 +338,42 @@ def identity_read_compartments(identity, tenancy):
             raise
 
         ###################################################
-        # Build Compartments - return nested compartment list
+        # Group compartments by parent id in one pass
         ###################################################
-        def build_compartments_nested(identity_client, cid, path):
+        children_by_parent = {}
+        for c in all_compartments:
+            children_by_parent.setdefault(str(c.compartment_id), []).append(c)
 
-            try:
-                compartment_list = [item for item in all_compartments if str(item.compartment_id) == str(cid)]
+        ###################################################
+        # Build Compartments - walk the tree iteratively,
+        # compartments which are not active (deleted) or
+        # under a non active parent are kept as fallback
+        ###################################################
+        inactive_compartments = []
 
-                if path != "":
-                    path = path + " / "
+        def build_compartments_tree(root_id):
 
-                for c in compartment_list:
-                    if c.lifecycle_state == oci.identity.models.Compartment.LIFECYCLE_STATE_ACTIVE:
-                        cvalue = {'id': str(c.id), 'name': str(c.name), 'path': path + str(c.name)}
+            try:
+                # stack of (children iterator, parent path, parent active), walked
+                # depth first in the same order as the nested build
+                stack = [(iter(children_by_parent.get(root_id, [])), "", True)]
+                while stack:
+                    children, path, active = stack[-1]
+                    c = next(children, None)
+                    if c is None:
+                        stack.pop()
+                        continue
+
+                    cvalue = {'id': str(c.id), 'name': str(c.name), 'path': (path + " / " if path != "" else "") + str(c.name)}
+                    is_active = active and c.lifecycle_state == oci.identity.models.Compartment.LIFECYCLE_STATE_ACTIVE
+                    if is_active:
                         compartments.append(cvalue)
-                        build_compartments_nested(identity_client, c.id, cvalue['path'])
+                    else:
+                        inactive_compartments.append(cvalue)
+                    stack.append((iter(children_by_parent.get(cvalue['id'], [])), cvalue['path'], is_active))
 
             except Exception as error:
-                raise Exception("Error in build_compartments_nested: " + str(error.args))
+                raise Exception("Error in build_compartments_tree: " + str(error.args))
 
         ###################################################
         # Add root compartment
@@ -191,13 +382,26 @@ def identity_read_compartments(identity, tenancy):
         compartments.append(value)
 
         # Build the compartments
-        build_compartments_nested(identity, str(tenancy.id), "")
+        build_compartments_tree(str(tenancy.id))
 
         # sort the compartment
         sorted_compartments = sorted(compartments, key=lambda k: k['path'])
         print("    Total " + str(len(sorted_compartments)) + " compartments loaded.")
         logging.info("    Total " + str(len(sorted_compartments)) + " compartments loaded.")
-        return sorted_compartments
+
+        ###################################################
+        # Build compartment index keyed by OCID, active
+        # compartments first in path order, followed by the
+        # fallback for compartments which are not active
+        ###################################################
+        compartments_index = {}
+        for c in sorted_compartments:
+            compartments_index[c['id']] = c
+
+        for c in sorted(inactive_compartments, key=lambda k: k['path']):
+            compartments_index[c['id']] = c
+
+        return compartments_index
 
     except oci.exceptions.RequestException:
         raise
@@ -212,7 +416,9 @@ def set_parser_arguments():
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-c', type=argparse.FileType('r'), dest='config', help="Config File")
-    parser.add_argument('-t', default="", dest='profile', help='Config file section to use (tenancy profile)')
+    parser.add_argument('-t', action='append', dest='profiles', help='Config file section to use (tenancy profile), can be repeated')
+    parser.add_argument('--profiles-file', default="", dest='profiles_file', help='File with the config file sections to load, one per line')
+    parser.add_argument('--tenant-workers', default=4, type=int, dest='tenant_workers', help='Number of tenants to load concurrently (default 4)')
     parser.add_argument('-f', default="", dest='fileid', help='File Id to load')
     parser.add_argument('-d', default="", dest='filedate', help='Minimum File Date to load (i.e. yyyy-mm-dd)')
     parser.add_argument('-p', default="", dest='proxy', help='Set Proxy (i.e. www-proxy-server.com:80) ')
@@ -220,6 +426,23 @@ def set_parser_arguments():
     parser.add_argument('-du', default="", dest='duser', help='ADB User')
     parser.add_argument('-dp', default="", dest='dpass', help='ADB Password')
     parser.add_argument('-dn', default="", dest='dname', help='ADB Name')
+    parser.add_argument('--workers', default=1, type=int, dest='workers', help='Number of report files to download and parse concurrently, per report type (default 1)')
+    parser.add_argument('--processes', default=0, type=int, dest='processes', help='Number of processes to transform the rows in chunks of --batch-size, for very large files (default 0, in the worker threads)')
+    parser.add_argument('--batch-size', default=10000, type=int, dest='batch_size', help='Number of rows per database insert batch (default 10000)')
+    parser.add_argument('--backfill', action='store_true', default=False, dest='backfill', help='Direct path load for initial loads and backfills, indexes are rebuilt at the end (use a larger --batch-size)')
+    parser.add_argument('--partitioned', action='store_true', default=False, dest='partitioned', help='Create OCI_USAGE and OCI_COST partitioned by month and tenant, and load the files through a stage table')
+    parser.add_argument('--cache-dir', default="", dest='cache_dir', help='Keep the downloaded report files in this dir, reloads read them from there')
+    parser.add_argument('--cache-size', default=10240, type=int, dest='cache_size', help='Max size of the report cache in MB, least recently used files are removed (default 10240)')
+    parser.add_argument('--replay-dir', default="", dest='replay_dir', help='Load the report files of a single tenancy from usage-csv and cost-csv of this dir, without Object Storage')
+    parser.add_argument('--stream', action='store_true', default=False, dest='stream', help='Stream report files from Object Storage without writing them to the work dir')
+    parser.add_argument('--rates-url', default=public_rates_url, dest='rates_url', help='Public rates API url, SKU is appended (default metering API)')
+    parser.add_argument('--rates-cache', default=work_report_dir + "/public_rates_cache.json", dest='rates_cache', help='Public rates cache file, empty to disable')
+    parser.add_argument('--rates-cache-ttl', default=24, type=float, dest='rates_cache_ttl', help='Hours to keep public rates in the cache (default 24)')
+    parser.add_argument('--rates-workers', default=4, type=int, dest='rates_workers', help='Number of concurrent public rates API calls (default 4)')
+    parser.add_argument('--run-report-dir', default=work_report_dir, dest='run_report_dir', help='Dir of the json run report with the time of the load stages, empty to disable (default work dir)')
+    parser.add_argument('--load-metrics', action='store_true', default=False, dest='load_metrics', help='Insert the time of the load stages of each file to OCI_LOAD_METRICS')
+    parser.add_argument('--sku-repairs-file', default="", dest='sku_repairs_file', help='Csv file of SKU, product description, billing unit for SKUs without description in the cost report')
+    collector_profiler.add_profiler_arguments(parser)
     parser.add_argument('--version', action='version', version='%(prog)s ' + version)
 
     result = parser.parse_args()
@@ -229,13 +452,19 @@ def set_parser_arguments():
         print_header("You must specify database credentials!!", 0)
         return None
 
+    # each tenant uses two connections of the session pool, for its pipelines
+    if result.tenant_workers < 1:
+        parser.print_help()
+        print_header("--tenant-workers must be 1 or more!!", 0)
+        return None
+
     return result
 
 
 ##########################################################################
 # Check Table Structure for usage
 ##########################################################################
-def check_database_table_structure_usage(connection):
+def check_database_table_structure_usage(connection, partitioned=False):
     try:
         # open cursor
         cursor = connection.cursor()
@@ -269,8 +498,10 @@ def check_database_table_structure_usage(connection):
             sql += "    IS_CORRECTION           VARCHAR2(10),"
             sql += "    TAGS_DATA               VARCHAR2(4000)"
             sql += ") COMPRESS"
+            if partitioned:
+                sql += get_report_table_partitioning()
             cursor.execute(sql)
-            print("   Table OCI_USAGE created")
+            print("   Table OCI_USAGE created" + (" partitioned" if partitioned else ""))
         else:
             print("   Table OCI_USAGE exist")
             logging.info("   Table OCI_USAGE exist")
@@ -326,6 +557,11 @@ def check_database_table_structure_usage(connection):
         else:
             print("   Table OCI_USAGE_STATS exist")
             logging.info("   Table OCI_USAGE_STATS exist")
+
+        # partitioned load goes through the staging table
+        if partitioned:
+            check_database_table_structure_stage(connection, "OCI_USAGE")
+
         # close cursor
         cursor.close()
 
@@ -355,9 +591,14 @@ def check_database_index_structure_usage(connection):
             print("\nChecking Index for OCI_USAGE")
             print("   Index OCI_USAGE_1IX does not exist for table OCI_USAGE, adding...")
             sql = "CREATE INDEX OCI_USAGE_1IX ON OCI_USAGE(TENANT_NAME,USAGE_INTERVAL_START)"
+            if is_table_partitioned(cursor, "OCI_USAGE"):
+                sql += " LOCAL"
             cursor.execute(sql)
             print("   Index created.")
 
+        # index marked unusable by a backfill load, rebuild it
+        rebuild_unusable_index(cursor, "OCI_USAGE_1IX")
+
         # close cursor
         cursor.close()
 
@@ -387,9 +628,14 @@ def check_database_index_structure_cost(connection):
             print("\nChecking Index for OCI_COST")
             print("   Index OCI_COST_1IX does not exist for table OCI_COST, adding...")
             sql = "CREATE INDEX OCI_COST_1IX ON OCI_COST(TENANT_NAME,USAGE_INTERVAL_START)"
+            if is_table_partitioned(cursor, "OCI_COST"):
+                sql += " LOCAL"
             cursor.execute(sql)
             print("   Index created.")
 
+        # index marked unusable by a backfill load, rebuild it
+        rebuild_unusable_index(cursor, "OCI_COST_1IX")
+
         # close cursor
         cursor.close()
 
@@ -401,6 +647,39 @@ def check_database_index_structure_cost(connection):
         raise Exception("\nError manipulating database at check_database_index_structure_cost() - " + str(e))
 
 
+##########################################################################
+# Check if table is partitioned
+##########################################################################
+def is_table_partitioned(cursor, table_name):
+    sql = "select count(*) from user_tables where table_name = :table_name and partitioned = 'YES'"
+    cursor.execute(sql, {"table_name": table_name})
+    val, = cursor.fetchone()
+    return val > 0
+
+
+##########################################################################
+# Rebuild the unusable index, or its unusable partitions and subpartitions
+# for a local index of a partitioned table
+##########################################################################
+def rebuild_unusable_index(cursor, index_name):
+    sql = "select 'ALTER INDEX ' || index_name || ' REBUILD' from user_indexes where index_name = :index_name and status = 'UNUSABLE' "
+    sql += "union all "
+    sql += "select 'ALTER INDEX ' || index_name || ' REBUILD PARTITION ' || partition_name from user_ind_partitions where index_name = :index_name and status = 'UNUSABLE' "
+    sql += "union all "
+    sql += "select 'ALTER INDEX ' || index_name || ' REBUILD SUBPARTITION ' || subpartition_name from user_ind_subpartitions where index_name = :index_name and status = 'UNUSABLE' "
+    cursor.execute(sql, {"index_name": index_name})
+    statements = [row[0] for row in cursor.fetchall()]
+    if not statements:
+        return
+
+    print("\nRebuilding Index " + index_name + "...")
+    logging.info("Rebuilding Index " + index_name + "...")
+    for sql in statements:
+        cursor.execute(sql)
+    print("   Index rebuilt, " + str(len(statements)) + " segments.")
+    logging.info("   Index rebuilt, " + str(len(statements)) + " segments.")
+
+
 ##########################################################################
 # update_cost_stats
 ##########################################################################
@@ -504,6 +783,104 @@ def update_price_list(connection):
         raise Exception("\nError manipulating database at update_price_list() - " + str(e))
 
 
+##########################################################################
+# Add price to the latest prices per SKU if it is later, same order as
+# update_price_list - USAGE_INTERVAL_START desc, COST_UNIT_PRICE desc,
+# where nulls come first in descending order
+# price is (USAGE_INTERVAL_START, PRD_DESCRIPTION, COST_CURRENCY_CODE, COST_UNIT_PRICE)
+##########################################################################
+def add_cost_price(prices, sku, price):
+    current = prices.get(sku)
+    if current is None:
+        prices[sku] = price
+        return
+
+    start, current_start = price[0], current[0]
+    if start != current_start:
+        if current_start is not None and (start is None or start > current_start):
+            prices[sku] = price
+        return
+
+    unit_price, current_unit_price = price[3], current[3]
+    if unit_price == current_unit_price or current_unit_price is None:
+        return
+    if unit_price is None or unit_price > current_unit_price:
+        prices[sku] = price
+
+
+##########################################################################
+# merge_price_list - merge the SKUs which their latest price, currency or
+# description changed by the loaded files, a price of the run is merged
+# only if its USAGE_INTERVAL_START is the latest of the SKU in OCI_COST,
+# so files of older intervals loaded late do not replace newer prices
+##########################################################################
+def merge_price_list(connection, tenant_name, run_summary):
+    try:
+        if not run_summary['prices']:
+            return
+
+        # open cursor
+        cursor = connection.cursor()
+
+        print("\nMerging changed prices into OCI_PRICE_LIST...")
+        logging.info("Merging changed prices into OCI_PRICE_LIST...")
+
+        # current price list of the tenant, the unit price is fetched as text to compare it as Decimal
+        sql = "select COST_PRODUCT_SKU, PRD_DESCRIPTION, COST_CURRENCY_CODE, to_char(COST_UNIT_PRICE, 'TM9') from OCI_PRICE_LIST where TENANT_NAME=:tenant_name"
+        cursor.execute(sql, {"tenant_name": str(tenant_name)})
+        price_list = {}
+        for row in cursor.fetchall():
+            price_list[row[0]] = (row[1], row[2], decimal.Decimal(row[3]) if row[3] is not None else None)
+
+        # latest interval of the SKUs in OCI_COST, from the oldest interval of the run prices
+        latest_starts = {}
+        starts = [price[0] for price in run_summary['prices'].values() if price[0] is not None]
+        if starts:
+            sql = "select COST_PRODUCT_SKU, max(USAGE_INTERVAL_START) from OCI_COST where TENANT_NAME=:tenant_name and USAGE_INTERVAL_START >= :usage_interval_start group by COST_PRODUCT_SKU"
+            cursor.execute(sql, {"tenant_name": str(tenant_name), "usage_interval_start": min(starts)})
+            for row in cursor.fetchall():
+                latest_starts[row[0]] = row[1]
+
+        data = []
+        for sku, price in sorted(run_summary['prices'].items()):
+            if sku == "":
+                continue
+
+            # a newer interval of the SKU is in OCI_COST, the price of the run is older
+            usage_interval_start, description, currency_code, unit_price = price
+            latest_start = latest_starts.get(sku)
+            if usage_interval_start is not None and latest_start is not None and usage_interval_start < latest_start:
+                continue
+
+            # empty strings are nulls in the database
+            value = (description or None, currency_code or None, unit_price)
+            if price_list.get(sku) != value:
+                data.append((str(tenant_name), sku, value[0], value[1], value[2]))
+
+        if data:
+            sql = "MERGE INTO OCI_PRICE_LIST A "
+            sql += "USING (SELECT :1 AS TENANT_NAME, :2 AS COST_PRODUCT_SKU, :3 AS PRD_DESCRIPTION, :4 AS COST_CURRENCY_CODE, :5 AS COST_UNIT_PRICE FROM DUAL) B "
+            sql += "ON (A.TENANT_NAME = B.TENANT_NAME AND A.COST_PRODUCT_SKU = B.COST_PRODUCT_SKU) "
+            sql += "WHEN MATCHED THEN UPDATE SET A.PRD_DESCRIPTION=B.PRD_DESCRIPTION, A.COST_CURRENCY_CODE=B.COST_CURRENCY_CODE, A.COST_UNIT_PRICE=B.COST_UNIT_PRICE, COST_LAST_UPDATE = SYSDATE "
+            sql += "WHEN NOT MATCHED THEN INSERT (TENANT_NAME,COST_PRODUCT_SKU,PRD_DESCRIPTION,COST_CURRENCY_CODE,COST_UNIT_PRICE,COST_LAST_UPDATE)  "
+            sql += "  VALUES (B.TENANT_NAME,B.COST_PRODUCT_SKU,B.PRD_DESCRIPTION,B.COST_CURRENCY_CODE,B.COST_UNIT_PRICE,SYSDATE)"
+
+            cursor.prepare(sql)
+            cursor.executemany(None, data)
+            connection.commit()
+
+        print("   Merge Completed, " + str(len(data)) + " SKUs changed")
+        logging.info("   Merge Completed, " + str(len(data)) + " SKUs changed")
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at merge_price_list() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at merge_price_list() - " + str(e))
+
+
 ##########################################################################
 # update_cost_reference
 ##########################################################################
@@ -556,15 +933,163 @@ def update_cost_reference(connection):
         raise Exception("\nError manipulating database at update_cost_reference() - " + str(e))
 
 
+##########################################################################
+# Is SKU description lower - the description replaces the one kept for
+# the SKU like min(PRD_DESCRIPTION), empty is null and only kept if there
+# is no other
+##########################################################################
+def is_sku_description_lower(skus, sku, description):
+    return sku not in skus or (description != "" and (skus[sku] == "" or description < skus[sku]))
+
+
+##########################################################################
+# Add SKU description - keep the min description of the SKU
+##########################################################################
+def add_sku_description(skus, sku, description):
+    if is_sku_description_lower(skus, sku, description):
+        skus[sku] = description
+
+
+##########################################################################
+# merge_cost_reference - merge the reference values of the loaded files
+# only, the values follow the full scan at update_cost_reference
+# the SKU description is the min of the descriptions in the reference
+# and of the run, as min(PRD_DESCRIPTION) over OCI_COST
+##########################################################################
+def merge_cost_reference(connection, tenant_name, run_summary):
+    try:
+        references = set()
+        for (service, compartment_name, compartment_path, region, subscription_id) in run_summary['references']:
+            references.add(('PRD_SERVICE', service))
+            references.add(('PRD_COMPARTMENT_NAME', compartment_name))
+            references.add(('PRD_REGION', region))
+
+            # top compartment of the path, like substr(path,1,instr(path,' /')-1)
+            if '/' in compartment_path:
+                position = compartment_path.find(' /')
+                references.add(('PRD_COMPARTMENT_PATH', compartment_path[:position] if position > 0 else ""))
+            else:
+                references.add(('PRD_COMPARTMENT_PATH', compartment_path))
+
+            # to_char of the number, without leading zeros
+            if subscription_id.isdigit():
+                subscription_id = subscription_id.lstrip("0") or "0"
+            references.add(('COST_SUBSCRIPTION_ID', subscription_id))
+
+        # open cursor
+        cursor = connection.cursor()
+
+        # descriptions of the SKUs already in the reference, REF_NAME is SKU || ' ' || description
+        skus = {}
+        if run_summary['skus']:
+            sql = "select REF_NAME from OCI_COST_REFERENCE where TENANT_NAME=:tenant_name and REF_TYPE='COST_PRODUCT_SKU'"
+            cursor.execute(sql, {"tenant_name": str(tenant_name)})
+            for row in cursor.fetchall():
+                sku, separator, description = row[0].partition(" ")
+                add_sku_description(skus, sku, description)
+
+        # a SKU row is added only if the run has a new SKU or a lower description,
+        # the empty SKU is null in the database and loaded as ' ' || description
+        for sku, description in run_summary['skus'].items():
+            if is_sku_description_lower(skus, sku, description):
+                references.add(('COST_PRODUCT_SKU', sku + " " + description))
+
+        # empty values are null in the database and not loaded
+        data = [(str(tenant_name), ref_type, ref_name) for (ref_type, ref_name) in sorted(references) if ref_name != ""]
+        if not data:
+            cursor.close()
+            return
+
+        print("\nMerging references into OCI_COST_REFERENCE...")
+        logging.info("Merging references into OCI_COST_REFERENCE...")
+        sql = "merge into OCI_COST_REFERENCE a "
+        sql += "using (select :1 as TENANT_NAME, :2 as REF_TYPE, :3 as REF_NAME from dual) b "
+        sql += "on (a.TENANT_NAME=b.TENANT_NAME and a.REF_TYPE=b.REF_TYPE and a.REF_NAME=b.REF_NAME) "
+        sql += "when not matched then insert (TENANT_NAME,REF_TYPE,REF_NAME)  "
+        sql += "values (b.TENANT_NAME,b.REF_TYPE,b.REF_NAME)"
+
+        cursor.prepare(sql)
+        cursor.executemany(None, data)
+        connection.commit()
+        print("   Merge Completed, " + str(cursor.rowcount) + " rows merged")
+        logging.info("   Merge Completed, " + str(cursor.rowcount) + " rows merged")
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at merge_cost_reference() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at merge_cost_reference() - " + str(e))
+
+
+##########################################################################
+# Fetch Public Rate of a SKU from the metering API
+# returns (description, paygo price, monthly flex price) or None if not found
+# other http errors are raised as requests.exceptions.HTTPError, a bad
+# body as ValueError or KeyError
+##########################################################################
+def fetch_public_rate(session, rates_url, cost_product_sku, currency_code):
+
+    resp = session.get(rates_url + cost_product_sku, headers={'X-Oracle-Accept-CurrencyCode': currency_code}, timeout=60)
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+
+    rate_description = ""
+    rate_paygo_price = None
+    rate_monthly_flex_price = None
+    for item in resp.json()['items']:
+        rate_description = item["displayName"]
+        for price in item['prices']:
+            if price['model'] == 'PAY_AS_YOU_GO':
+                rate_paygo_price = price['value']
+            elif price['model'] == 'MONTHLY_COMMIT':
+                rate_monthly_flex_price = price['value']
+
+    return rate_description, rate_paygo_price, rate_monthly_flex_price
+
+
+##########################################################################
+# Public Rates Cache - SKU and currency to rate, kept on disk between runs
+# rate is None for the SKUs not found by the API
+##########################################################################
+def load_public_rates_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (ValueError, OSError) as e:
+        print("   Ignoring public rates cache " + cache_file + " - " + str(e))
+        return {}
+
+
+def save_public_rates_cache(cache_file, cache):
+    if not cache_file:
+        return
+    # the tenants of the run share the cache, keep the rates saved by the others
+    with public_rates_cache_lock:
+        saved = load_public_rates_cache(cache_file)
+        saved.update(cache)
+
+        # write to temp file and replace to not leave a partial cache
+        with open(cache_file + ".tmp", 'w') as f:
+            json.dump(saved, f)
+        os.replace(cache_file + ".tmp", cache_file)
+
+
 ##########################################################################
 # update_public_rates
+# SKUs not in the cache or older than cache_ttl_hours are fetched
+# concurrently by a shared http session, rates_url can point to a local
+# server for testing, SKUs not found are cached for the same ttl
 ##########################################################################
-def update_public_rates(connection, tenant_name):
+def update_public_rates(connection, tenant_name, rates_url=public_rates_url, cache_file="", cache_ttl_hours=24, workers=4):
     try:
         # open cursor
         num_rows = 0
         cursor = connection.cursor()
-        api_url = "https://itra.oraclecloud.com/itas/.anon/myservices/api/v1/products?partNumber="
 
         print("\nMerging Public Rates into OCI_RATE_CARD...")
         logging.info("Merging Public Rates into OCI_RATE_CARD...")
@@ -575,49 +1100,70 @@ def update_public_rates(connection, tenant_name):
         rows = cursor.fetchall()
 
         if rows:
+            cache = load_public_rates_cache(cache_file)
+            now = time.time()
+            rates = {}
+            to_fetch = []
             for row in rows:
+                cost_product_sku = str(row[0])
+                currency_code = str(row[1])
+                cached = cache.get(cost_product_sku + "|" + currency_code)
+                if cached and now - cached['time'] < cache_ttl_hours * 3600:
+                    if cached['rate'] is not None:
+                        rates[cost_product_sku] = cached['rate']
+                else:
+                    to_fetch.append((cost_product_sku, currency_code))
+
+            # Call API to fetch the data, the fetched rates are cached also if a fetch failed
+            num_cached = len(rows) - len(to_fetch)
+            if to_fetch:
+                try:
+                    with requests.Session() as session:
+                        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+                        session.mount("https://", adapter)
+                        session.mount("http://", adapter)
+
+                        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                            futures = [(sku, currency, executor.submit(fetch_public_rate, session, rates_url, sku, currency)) for sku, currency in to_fetch]
+                            for cost_product_sku, currency_code, future in futures:
+                                try:
+                                    rate = future.result()
+                                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                                    # a failed SKU is skipped, the others are updated
+                                    print("   Error fetching public rate of " + cost_product_sku + " - " + str(e))
+                                    logging.info("   Error fetching public rate of " + cost_product_sku + " - " + str(e))
+                                    continue
+
+                                rate = list(rate) if rate is not None else None
+                                cache[cost_product_sku + "|" + currency_code] = {'time': now, 'rate': rate}
+                                if rate is not None:
+                                    rates[cost_product_sku] = rate
+
+                finally:
+                    save_public_rates_cache(cache_file, cache)
+
+            # update database
+            sql = "update OCI_PRICE_LIST set "
+            sql += "RATE_DESCRIPTION=:1, "
+            sql += "RATE_PAYGO_PRICE=:2, "
+            sql += "RATE_MONTHLY_FLEX_PRICE=:3, "
+            sql += "RATE_UPDATE_DATE=sysdate "
+            sql += "where TENANT_NAME=:4 and COST_PRODUCT_SKU=:5 "
 
-                rate_description = ""
-                rate_paygo_price = None
-                rate_monthly_flex_price = None
-
-                # Call API to fetch the data
-                cost_produdt_sku = str(row[0])
-                country_code = str(row[1])
-                resp = requests.get(api_url + cost_produdt_sku, headers={'X-Oracle-Accept-CurrencyCode': country_code})
-
-                if not resp:
-                    continue
+            data = []
+            for cost_product_sku, rate in rates.items():
+                rate_description, rate_paygo_price, rate_monthly_flex_price = rate
+                data.append((rate_description, rate_paygo_price, rate_monthly_flex_price, tenant_name, cost_product_sku))
 
-                for item in resp.json()['items']:
-                    rate_description = item["displayName"]
-                    for price in item['prices']:
-                        if price['model'] == 'PAY_AS_YOU_GO':
-                            rate_paygo_price = price['value']
-                        elif price['model'] == 'MONTHLY_COMMIT':
-                            rate_monthly_flex_price = price['value']
-
-                # update database
-                sql = "update OCI_PRICE_LIST set "
-                sql += "RATE_DESCRIPTION=:rate_description, "
-                sql += "RATE_PAYGO_PRICE=:rate_paygo, "
-                sql += "RATE_MONTHLY_FLEX_PRICE=:rate_monthly, "
-                sql += "RATE_UPDATE_DATE=sysdate "
-                sql += "where TENANT_NAME=:tenant_name and COST_PRODUCT_SKU=:cost_produdt_sku "
-
-                sql_variables = {
-                    "rate_description": rate_description,
-                    "rate_paygo": rate_paygo_price,
-                    "rate_monthly": rate_monthly_flex_price,
-                    "tenant_name": tenant_name,
-                    "cost_produdt_sku": cost_produdt_sku
-                }
-
-                cursor.execute(sql, sql_variables)
-                num_rows += 1
+            if data:
+                cursor.prepare(sql)
+                cursor.executemany(None, data)
+                num_rows = len(data)
 
             # Commit
             connection.commit()
+            print("   " + str(len(to_fetch)) + " SKUs fetched from the API, " + str(num_cached) + " SKUs from cache.")
+            logging.info("   " + str(len(to_fetch)) + " SKUs fetched from the API, " + str(num_cached) + " SKUs from cache.")
 
         print("   Update Completed, " + str(num_rows) + " rows updated.")
         logging.info("   Update Completed, " + str(num_rows) + " rows updated.")
@@ -634,6 +1180,49 @@ def update_public_rates(connection, tenant_name):
         raise Exception("\nError manipulating database at update_public_rates() - " + str(e))
 
 
+##########################################################################
+# Load Tag Keys already exist in the database for the tenant
+##########################################################################
+def load_tag_keys(connection, table_name, tenant_name):
+    try:
+        cursor = connection.cursor()
+        sql = "select TAG_KEY from " + table_name + " where TENANT_NAME=:tenant_name"
+        cursor.execute(sql, {"tenant_name": str(tenant_name)})
+        tags_keys = set(row[0] for row in cursor.fetchall())
+        cursor.close()
+        return tags_keys
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at load_tag_keys() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at load_tag_keys() - " + str(e))
+
+
+##########################################################################
+# Merge Tag Keys - merge the tag keys of a file which are not known yet
+# in a single array bound merge, runs in the file transaction so the keys
+# are committed with the file, commit is done by the caller
+##########################################################################
+def merge_tag_keys(connection, table_name, tenant_name, known_tags_keys, file_tags_keys):
+    new_tags_keys = sorted(file_tags_keys - known_tags_keys)
+    if not new_tags_keys:
+        return
+
+    cursor = connection.cursor()
+    sql = "MERGE INTO " + table_name + " A "
+    sql += "USING (SELECT :1 TENANT_NAME, :2 TAG_KEY FROM DUAL) B "
+    sql += "ON (A.TENANT_NAME = B.TENANT_NAME AND A.TAG_KEY = B.TAG_KEY) "
+    sql += "WHEN NOT MATCHED THEN INSERT (TENANT_NAME, TAG_KEY) VALUES (B.TENANT_NAME, B.TAG_KEY)"
+
+    cursor.prepare(sql)
+    cursor.executemany(None, [(str(tenant_name), tag) for tag in new_tags_keys])
+    cursor.close()
+    print("   Total " + str(len(new_tags_keys)) + " New Tags Merged into " + table_name + ".")
+    logging.info("   Total " + str(len(new_tags_keys)) + " New Tags Merged into " + table_name + ".")
+
+
 ##########################################################################
 # update_usage_stats
 ##########################################################################
@@ -680,10 +1269,117 @@ def update_usage_stats(connection):
         raise Exception("\nError manipulating database at update_usage_stats() - " + str(e))
 
 
+##########################################################################
+# Add cost row to the file statistics, keyed by USAGE_INTERVAL_START
+# [NUM_ROWS, COST_MY_COST, COST_MY_COST_OVERAGE, COST_CURRENCY_CODE]
+# sums and min ignore empty values like the database does for nulls
+##########################################################################
+def add_cost_stats(file_stats, row_data):
+    stats = file_stats.get(row_data[2])
+    if stats is None:
+        stats = file_stats[row_data[2]] = [0, None, None, None]
+
+    stats[0] += 1
+    if row_data[18] is not None:
+        stats[1] = row_data[18] + (stats[1] or 0)
+    if row_data[19] is not None:
+        stats[2] = row_data[19] + (stats[2] or 0)
+    if row_data[20] != "" and (stats[3] is None or row_data[20] < stats[3]):
+        stats[3] = row_data[20]
+
+
+##########################################################################
+# merge_usage_stats - merge the statistics of a loaded file only,
+# runs in the file transaction, commit is done by the caller
+##########################################################################
+def merge_usage_stats(connection, tenant_name, file_id, file_stats):
+    if not file_stats:
+        return
+
+    cursor = connection.cursor()
+    sql = "merge into OCI_USAGE_STATS a "
+    sql += "using "
+    sql += "( "
+    sql += "    select  "
+    sql += "        :tenant_name as tenant_name, "
+    sql += "        :file_id as file_id, "
+    sql += "        :usage_interval_start as USAGE_INTERVAL_START, "
+    sql += "        :num_rows as NUM_ROWS "
+    sql += "    from dual "
+    sql += ") b "
+    sql += "on (a.tenant_name=b.tenant_name and a.file_id=b.file_id and a.USAGE_INTERVAL_START=b.USAGE_INTERVAL_START) "
+    sql += "when matched then update set a.num_rows=b.num_rows, a.UPDATE_DATE=sysdate, a.AGENT_VERSION=:version "
+    sql += "where a.num_rows <> b.num_rows "
+    sql += "when not matched then insert (TENANT_NAME,FILE_ID,USAGE_INTERVAL_START,NUM_ROWS,UPDATE_DATE,AGENT_VERSION)  "
+    sql += "   values (b.TENANT_NAME,b.FILE_ID,b.USAGE_INTERVAL_START,b.NUM_ROWS,sysdate,:version) "
+
+    data = []
+    for usage_interval_start, num_rows in file_stats.items():
+        data.append({
+            "tenant_name": str(tenant_name),
+            "file_id": file_id,
+            "usage_interval_start": usage_interval_start,
+            "num_rows": num_rows,
+            "version": version
+        })
+
+    cursor.prepare(sql)
+    cursor.executemany(None, data)
+    cursor.close()
+
+
+##########################################################################
+# merge_cost_stats - merge the statistics of a loaded file only,
+# runs in the file transaction, commit is done by the caller
+##########################################################################
+def merge_cost_stats(connection, tenant_name, file_id, file_stats):
+    if not file_stats:
+        return
+
+    cursor = connection.cursor()
+    sql = "merge into OCI_COST_STATS a "
+    sql += "using "
+    sql += "( "
+    sql += "    select  "
+    sql += "        :tenant_name as tenant_name, "
+    sql += "        :file_id as file_id, "
+    sql += "        :usage_interval_start as USAGE_INTERVAL_START, "
+    sql += "        :cost_my_cost as COST_MY_COST, "
+    sql += "        :cost_my_cost_overage as COST_MY_COST_OVERAGE, "
+    sql += "        :cost_currency_code as COST_CURRENCY_CODE, "
+    sql += "        :num_rows as NUM_ROWS "
+    sql += "    from dual "
+    sql += ") b "
+    sql += "on (a.tenant_name=b.tenant_name and a.file_id=b.file_id and a.USAGE_INTERVAL_START=b.USAGE_INTERVAL_START) "
+    sql += "when matched then update set a.num_rows=b.num_rows, a.COST_MY_COST=b.COST_MY_COST, a.UPDATE_DATE=sysdate, a.AGENT_VERSION=:version,"
+    sql += "    a.COST_MY_COST_OVERAGE=b.COST_MY_COST_OVERAGE, a.COST_CURRENCY_CODE=b.COST_CURRENCY_CODE "
+    sql += "where a.num_rows <> b.num_rows "
+    sql += "when not matched then insert (TENANT_NAME,FILE_ID,USAGE_INTERVAL_START,NUM_ROWS,COST_MY_COST,UPDATE_DATE,AGENT_VERSION,COST_MY_COST_OVERAGE,COST_CURRENCY_CODE)  "
+    sql += "   values (b.TENANT_NAME,b.FILE_ID,b.USAGE_INTERVAL_START,b.NUM_ROWS,b.COST_MY_COST,sysdate,:version,b.COST_MY_COST_OVERAGE,b.COST_CURRENCY_CODE) "
+
+    data = []
+    for usage_interval_start, stats in file_stats.items():
+        num_rows, cost_my_cost, cost_my_cost_overage, cost_currency_code = stats
+        data.append({
+            "tenant_name": str(tenant_name),
+            "file_id": file_id,
+            "usage_interval_start": usage_interval_start,
+            "cost_my_cost": cost_my_cost,
+            "cost_my_cost_overage": cost_my_cost_overage,
+            "cost_currency_code": cost_currency_code,
+            "num_rows": num_rows,
+            "version": version
+        })
+
+    cursor.prepare(sql)
+    cursor.executemany(None, data)
+    cursor.close()
+
+
 ##########################################################################
 # Check Table Structure Cost
 ##########################################################################
-def check_database_table_structure_cost(connection):
+def check_database_table_structure_cost(connection, partitioned=False):
     try:
         # open cursor
         cursor = connection.cursor()
@@ -724,8 +1420,10 @@ def check_database_table_structure_cost(connection):
             sql += "    IS_CORRECTION           VARCHAR2(10),"
             sql += "    TAGS_DATA               VARCHAR2(4000)"
             sql += ") COMPRESS"
+            if partitioned:
+                sql += get_report_table_partitioning()
             cursor.execute(sql)
-            print("   Table OCI_COST created")
+            print("   Table OCI_COST created" + (" partitioned" if partitioned else ""))
         else:
             print("   Table OCI_COST exist")
             logging.info("   Table OCI_COST exist")
@@ -810,6 +1508,10 @@ def check_database_table_structure_cost(connection):
             print("   Table OCI_COST_REFERENCE exist")
             logging.info("   Table OCI_COST_REFERENCE exist")
 
+        # partitioned load goes through the staging table
+        if partitioned:
+            check_database_table_structure_stage(connection, "OCI_COST")
+
         # close cursor
         cursor.close()
 
@@ -824,7 +1526,7 @@ def check_database_table_structure_cost(connection):
 ##########################################################################
 # Check Table Structure Price List
 ##########################################################################
-def check_database_table_structure_price_list(connection, tenant_name):
+def check_database_table_structure_price_list(connection):
     try:
         # open cursor
         cursor = connection.cursor()
@@ -853,7 +1555,8 @@ def check_database_table_structure_price_list(connection, tenant_name):
             cursor.execute(sql)
             print("   Table OCI_PRICE_LIST created")
             update_price_list(connection)
-            update_public_rates(connection, tenant_name)
+            for tenant_name in load_price_list_tenants(connection):
+                update_public_rates(connection, tenant_name)
         else:
             print("   Table OCI_PRICE_LIST exist")
             logging.info("   Table OCI_PRICE_LIST exist")
@@ -868,448 +1571,1617 @@ def check_database_table_structure_price_list(connection, tenant_name):
         raise Exception("\nError manipulating database at check_database_table_price_list() - " + str(e))
 
 
-#########################################################################
-# Load Cost File
 ##########################################################################
-def load_cost_file(connection, object_storage, object_file, max_file_id, cmd, tenancy, compartments):
-    num = 0
-    try:
-        o = object_file
-
-        # keep tag keys per file
-        tags_keys = []
-
-        # get file name
-        filename = o.name.rsplit('/', 1)[-1]
-        file_id = filename[:-7]
-        file_time = str(o.time_created)[0:16]
-
-        # if file already loaded, skip (check if < max_file_id
-        if str(max_file_id) != "None":
-            if file_id <= str(max_file_id):
-                return num
-
-        # if file id enabled, check
-        if cmd.fileid:
-            if file_id != cmd.fileid:
-                return num
-
-        # check file date
-        if cmd.filedate:
-            if file_time <= cmd.filedate:
-                return num
-
-        path_filename = work_report_dir + '/' + filename
-        print("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
-        logging.info("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
-        # download file
-        object_details = object_storage.get_object(usage_report_namespace, str(tenancy.id), o.name)
-        with open(path_filename, 'wb') as f:
-            for chunk in object_details.data.raw.stream(1024 * 1024, decode_content=False):
-                f.write(chunk)
-
-        # Read file to variable
-        with gzip.open(path_filename, 'rt') as file_in:
-            csv_reader = csv.DictReader(file_in)
-
-            data = []
-            for row in csv_reader:
-
-                # find compartment path
-                compartment_path = ""
-                for c in compartments:
-                    if c['id'] == row['product/compartmentId']:
-                        compartment_path = c['path']
-
-                # Handle Tags up to 4000 chars with # seperator
-                tags_data = ""
-                for (key, value) in row.items():
-                    if 'tags' in key and len(value) > 0:
-
-                        # remove # and = from the tags keys and value
-                        keyadj = str(key).replace("tags/", "").replace("#", "").replace("=", "")
-                        valueadj = str(value).replace("#", "").replace("=", "")
-
-                        # check if length < 4000 to avoid overflow database column
-                        if len(tags_data) + len(keyadj) + len(valueadj) + 2 < 4000:
-                            tags_data += ("#" if tags_data == "" else "") + keyadj + "=" + valueadj + "#"
-
-                        # add tag key to tag_keys array
-                            if keyadj not in tags_keys:
-                                tags_keys.append(keyadj)
-
-                # Assign each column to variable to avoid error if column missing from the file
-                lineItem_intervalUsageStart = get_column_value_from_array('lineItem/intervalUsageStart', row)
-                lineItem_intervalUsageEnd = get_column_value_from_array('lineItem/intervalUsageEnd', row)
-                product_service = get_column_value_from_array('product/service', row)
-                product_compartmentId = get_column_value_from_array('product/compartmentId', row)
-                product_compartmentName = get_column_value_from_array('product/compartmentName', row)
-                product_region = get_column_value_from_array('product/region', row)
-                product_availabilityDomain = get_column_value_from_array('product/availabilityDomain', row)
-                product_resourceId = get_column_value_from_array('product/resourceId', row)
-                usage_billedQuantity = get_column_value_from_array('usage/billedQuantity', row)
-                usage_billedQuantityOverage = get_column_value_from_array('usage/billedQuantityOverage', row)
-                cost_subscriptionId = get_column_value_from_array('cost/subscriptionId', row)
-                cost_productSku = get_column_value_from_array('cost/productSku', row)
-                product_Description = get_column_value_from_array('product/Description', row)
-                cost_unitPrice = get_column_value_from_array('cost/unitPrice', row)
-                cost_unitPriceOverage = get_column_value_from_array('cost/unitPriceOverage', row)
-                cost_myCost = get_column_value_from_array('cost/myCost', row)
-                cost_myCostOverage = get_column_value_from_array('cost/myCostOverage', row)
-                cost_currencyCode = get_column_value_from_array('cost/currencyCode', row)
-                cost_billingUnitReadable = get_column_value_from_array('cost/billingUnitReadable', row)
-                cost_overageFlag = get_column_value_from_array('cost/overageFlag', row)
-                lineItem_isCorrection = get_column_value_from_array('lineItem/isCorrection', row)
-
-                # Fix OCI Data for missing product description
-                if cost_productSku == "B88285" and product_Description == "":
-                    product_Description = "Object Storage Classic"
-                    cost_billingUnitReadable = "Gigabyte Storage Capacity per Month"
-
-                elif cost_productSku == "B88272" and product_Description == "":
-                    product_Description = "Compute Classic - Unassociated Static IP"
-                    cost_billingUnitReadable = "IPs"
-
-                elif cost_productSku == "B88166" and product_Description == "":
-                    product_Description = "Oracle Identity Cloud - Standard"
-                    cost_billingUnitReadable = "Active User per Hour"
-
-                elif cost_productSku == "B88167" and product_Description == "":
-                    product_Description = "Oracle Identity Cloud - Basic"
-                    cost_billingUnitReadable = "Active User per Hour"
-
-                elif cost_productSku == "B88168" and product_Description == "":
-                    product_Description = "Oracle Identity Cloud - Basic - Consumer User"
-                    cost_billingUnitReadable = "Active User per Hour"
-
-                elif cost_productSku == "B88274" and product_Description == "":
-                    product_Description = "Block Storage Classic"
-                    cost_billingUnitReadable = "Gigabyte Storage Capacity per Month"
-
-                elif cost_productSku == "B89164" and product_Description == "":
-                    product_Description = "Oracle Security Monitoring and Compliance Edition"
-                    cost_billingUnitReadable = "100 Entities Per Hour"
-
-                elif cost_productSku == "B88269" and product_Description == "":
-                    product_Description = "Compute Classic"
-                    cost_billingUnitReadable = "OCPU Per Hour "
-
-                elif cost_productSku == "B88269" and product_Description == "":
-                    product_Description = "Compute Classic"
-                    cost_billingUnitReadable = "OCPU Per Hour"
-
-                elif cost_productSku == "B88275" and product_Description == "":
-                    product_Description = "Block Storage Classic - High I/O"
-                    cost_billingUnitReadable = "Gigabyte Storage Per Month"
-
-                elif cost_productSku == "B88283" and product_Description == "":
-                    product_Description = "Object Storage Classic - GET and all other Requests"
-                    cost_billingUnitReadable = "10,000 Requests Per Month"
-
-                elif cost_productSku == "B88284" and product_Description == "":
-                    product_Description = "Object Storage Classic - PUT, COPY, POST or LIST Requests"
-                    cost_billingUnitReadable = "10,000 Requests Per Month"
-
-                # create array
-                row_data = (
-                    str(tenancy.name),
-                    file_id,
-                    lineItem_intervalUsageStart[0:10] + " " + lineItem_intervalUsageStart[11:16],
-                    lineItem_intervalUsageEnd[0:10] + " " + lineItem_intervalUsageEnd[11:16],
-                    product_service,
-                    product_compartmentId,
-                    product_compartmentName,
-                    compartment_path,
-                    product_region,
-                    product_availabilityDomain,
-                    product_resourceId,
-                    usage_billedQuantity,
-                    usage_billedQuantityOverage,
-                    cost_subscriptionId,
-                    cost_productSku,
-                    product_Description,
-                    cost_unitPrice,
-                    cost_unitPriceOverage,
-                    cost_myCost,
-                    cost_myCostOverage,
-                    cost_currencyCode,
-                    cost_billingUnitReadable,
-                    cost_overageFlag,
-                    lineItem_isCorrection,
-                    tags_data
-                )
-                data.append(row_data)
-
-            # insert bulk to database
-            cursor = cx_Oracle.Cursor(connection)
-            sql = "INSERT INTO OCI_COST ("
-            sql += "TENANT_NAME,"
-            sql += "FILE_ID,"
-            sql += "USAGE_INTERVAL_START, "
-            sql += "USAGE_INTERVAL_END, "
-            sql += "PRD_SERVICE, "
-            # 6
-            sql += "PRD_COMPARTMENT_ID, "
-            sql += "PRD_COMPARTMENT_NAME, "
-            sql += "PRD_COMPARTMENT_PATH, "
-            sql += "PRD_REGION, "
-            sql += "PRD_AVAILABILITY_DOMAIN, "
-            # 11
-            sql += "USG_RESOURCE_ID, "
-            sql += "USG_BILLED_QUANTITY, "
-            sql += "USG_BILLED_QUANTITY_OVERAGE, "
-            sql += "COST_SUBSCRIPTION_ID, "
-            sql += "COST_PRODUCT_SKU, "
-            # 16
-            sql += "PRD_DESCRIPTION, "
-            sql += "COST_UNIT_PRICE, "
-            sql += "COST_UNIT_PRICE_OVERAGE, "
-            sql += "COST_MY_COST, "
-            sql += "COST_MY_COST_OVERAGE, "
-            # 21
-            sql += "COST_CURRENCY_CODE, "
-            sql += "COST_BILLING_UNIT, "
-            sql += "COST_OVERAGE_FLAG,"
-            sql += "IS_CORRECTION, "
-            sql += "TAGS_DATA "
-            sql += ") VALUES ("
-            sql += ":1, :2, to_date(:3,'YYYY-MM-DD HH24:MI'), to_date(:4,'YYYY-MM-DD HH24:MI'), :5,  "
-            sql += ":6, :7, :8, :9, :10, "
-            sql += ":11, to_number(:12), to_number(:13) ,:14, :15, "
-            sql += ":16, to_number(:17), to_number(:18), to_number(:19), to_number(:20), "
-            sql += ":21, :22, :23, :24, :25"
-            sql += ") "
+# Tenants in the price list
+##########################################################################
+def load_price_list_tenants(connection):
+    cursor = connection.cursor()
+    cursor.execute("select distinct TENANT_NAME from OCI_PRICE_LIST")
+    tenants = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return tenants
 
-            cursor.prepare(sql)
-            cursor.executemany(None, data)
-            connection.commit()
-            cursor.close()
-            print("   Completed  file " + o.name + " - " + str(len(data)) + " Rows Inserted")
-            logging.info("   Completed  file " + o.name + " - " + str(len(data)) + " Rows Inserted")
-        num += 1
 
-        # remove file
-        os.remove(path_filename)
+##########################################################################
+# Check Table Structure Load Files
+##########################################################################
+def check_database_table_structure_load_files(connection):
+    try:
+        # open cursor
+        cursor = connection.cursor()
 
-        #######################################
-        # insert bulk tags to the database
-        #######################################
-        data = []
-        for tag in tags_keys:
-            row_data = (str(tenancy.name), tag, str(tenancy.name), tag)
-            data.append(row_data)
+        # check if OCI_LOAD_FILES table exist, if not create
+        sql = "select count(*) from user_tables where table_name = 'OCI_LOAD_FILES'"
+        cursor.execute(sql)
+        val, = cursor.fetchone()
 
-        if data:
-            cursor = cx_Oracle.Cursor(connection)
-            sql = "INSERT INTO OCI_COST_TAG_KEYS (TENANT_NAME , TAG_KEY) "
-            sql += "SELECT :1, :2 FROM DUAL "
-            sql += "WHERE NOT EXISTS (SELECT 1 FROM OCI_COST_TAG_KEYS B WHERE B.TENANT_NAME = :3 AND B.TAG_KEY = :4)"
+        # if table not exist, create it
+        if val == 0:
+            print("   Table OCI_LOAD_FILES was not exist, creating")
+            sql = "create table OCI_LOAD_FILES ("
+            sql += "    TENANT_NAME             VARCHAR2(100),"
+            sql += "    REPORT_TYPE             VARCHAR2(10),"
+            sql += "    FILE_ID                 VARCHAR2(30),"
+            sql += "    FILE_SIZE               NUMBER,"
+            sql += "    NUM_ROWS                NUMBER,"
+            sql += "    LOAD_SECONDS            NUMBER,"
+            sql += "    LOAD_DATE               DATE,"
+            sql += "    AGENT_VERSION           VARCHAR2(30),"
+            sql += "    CONSTRAINT OCI_LOAD_FILES_PK PRIMARY KEY (TENANT_NAME,REPORT_TYPE,FILE_ID) "
+            sql += ") "
+            cursor.execute(sql)
+            print("   Table OCI_LOAD_FILES created")
+        else:
+            print("   Table OCI_LOAD_FILES exist")
+            logging.info("   Table OCI_LOAD_FILES exist")
 
-            cursor.prepare(sql)
-            cursor.executemany(None, data)
-            connection.commit()
-            cursor.close()
-            print("   Total " + str(len(data)) + " Tags Merged.")
-            logging.info("   Total " + str(len(data)) + " Tags Merged.")
-        return num
+        cursor.close()
 
     except cx_Oracle.DatabaseError as e:
-        print("\nload_cost_file() - Error manipulating database - " + str(e) + "\n")
+        print("\nError manipulating database at check_database_table_structure_load_files() - " + str(e) + "\n")
         raise SystemExit
 
     except Exception as e:
-        print("\nload_cost_file() - Error Download Usage and insert to database - " + str(e))
-        raise SystemExit
+        raise Exception("\nError manipulating database at check_database_table_structure_load_files() - " + str(e))
 
 
-#########################################################################
-# Load Usage File
 ##########################################################################
-def load_usage_file(connection, object_storage, object_file, max_file_id, cmd, tenancy, compartments):
-    num = 0
-    try:
-        o = object_file
+# Report Table Partitioning - monthly interval range partitions on
+# USAGE_INTERVAL_START with hash subpartitions on TENANT_NAME, queries
+# filtered by date prune the partitions, retention is a partition drop
+##########################################################################
+def get_report_table_partitioning():
+    sql = " PARTITION BY RANGE (USAGE_INTERVAL_START) INTERVAL (NUMTOYMINTERVAL(1,'MONTH')) "
+    sql += "SUBPARTITION BY HASH (TENANT_NAME) SUBPARTITIONS 4 "
+    sql += "(PARTITION P_INITIAL VALUES LESS THAN (DATE '2019-01-01'))"
+    return sql
 
-        # keep tag keys per file
-        tags_keys = []
-
-        # get file name
-        filename = o.name.rsplit('/', 1)[-1]
-        file_id = filename[:-7]
-        file_time = str(o.time_created)[0:16]
-
-        # if file already loaded, skip (check if < max_usage_file_id)
-        if str(max_file_id) != "None":
-            if file_id <= str(max_file_id):
-                return num
-
-        # if file id enabled, check
-        if cmd.fileid:
-            if file_id != cmd.file_id:
-                return num
-
-        # check file date
-        if cmd.filedate:
-            if file_time <= cmd.filedate:
-                return num
-
-        path_filename = work_report_dir + '/' + filename
-        print("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
-        logging.info("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
-        # download file
-        object_details = object_storage.get_object(usage_report_namespace, str(tenancy.id), o.name)
-        with open(path_filename, 'wb') as f:
-            for chunk in object_details.data.raw.stream(1024 * 1024, decode_content=False):
-                f.write(chunk)
-
-        # Read file to variable
-        with gzip.open(path_filename, 'rt') as file_in:
-            csv_reader = csv.DictReader(file_in)
 
-            data = []
-            for row in csv_reader:
-
-                # find compartment path
-                compartment_path = ""
-                for c in compartments:
-                    if c['id'] == row['product/compartmentId']:
-                        compartment_path = c['path']
-
-                # Handle Tags up to 4000 chars with # seperator
-                tags_data = ""
-                for (key, value) in row.items():
-                    if 'tags' in key and len(value) > 0:
-
-                        # remove # and = from the tags keys and value
-                        keyadj = str(key).replace("tags/", "").replace("#", "").replace("=", "")
-                        valueadj = str(value).replace("#", "").replace("=", "")
-
-                        # check if length < 4000 to avoid overflow database column
-                        if len(tags_data) + len(keyadj) + len(valueadj) + 2 < 4000:
-                            tags_data += ("#" if tags_data == "" else "") + keyadj + "=" + valueadj + "#"
-
-                        # add tag key to tag_keys array
-                            if keyadj not in tags_keys:
-                                tags_keys.append(keyadj)
-
-                # Assign each column to variable to avoid error if column missing from the file
-                lineItem_intervalUsageStart = get_column_value_from_array('lineItem/intervalUsageStart', row)
-                lineItem_intervalUsageEnd = get_column_value_from_array('lineItem/intervalUsageEnd', row)
-                product_service = get_column_value_from_array('product/service', row)
-                product_resource = get_column_value_from_array('product/resource', row)
-                product_compartmentId = get_column_value_from_array('product/compartmentId', row)
-                product_compartmentName = get_column_value_from_array('product/compartmentName', row)
-                product_region = get_column_value_from_array('product/region', row)
-                product_availabilityDomain = get_column_value_from_array('product/availabilityDomain', row)
-                product_resourceId = get_column_value_from_array('product/resourceId', row)
-                usage_billedQuantity = get_column_value_from_array('usage/billedQuantity', row)
-                usage_consumedQuantity = get_column_value_from_array('usage/consumedQuantity', row)
-                usage_consumedQuantityUnits = get_column_value_from_array('usage/consumedQuantityUnits', row)
-                usage_consumedQuantityMeasure = get_column_value_from_array('usage/consumedQuantityMeasure', row)
-                lineItem_isCorrection = get_column_value_from_array('lineItem/isCorrection', row)
-
-                # create array for bulk insert
-                row_data = (
-                    str(tenancy.name),
-                    file_id,
-                    lineItem_intervalUsageStart[0:10] + " " + lineItem_intervalUsageStart[11:16],
-                    lineItem_intervalUsageEnd[0:10] + " " + lineItem_intervalUsageEnd[11:16],
-                    product_service,
-                    product_resource,
-                    product_compartmentId,
-                    product_compartmentName,
-                    compartment_path,
-                    product_region,
-                    product_availabilityDomain,
-                    product_resourceId,
-                    usage_billedQuantity,
-                    usage_consumedQuantity,
-                    usage_consumedQuantityUnits,
-                    usage_consumedQuantityMeasure,
-                    lineItem_isCorrection,
-                    tags_data
-                )
-                data.append(row_data)
-
-            # insert bulk to database
-            cursor = cx_Oracle.Cursor(connection)
-            sql = "INSERT INTO OCI_USAGE (TENANT_NAME , FILE_ID, USAGE_INTERVAL_START, USAGE_INTERVAL_END, PRD_SERVICE, PRD_RESOURCE, "
-            sql += "PRD_COMPARTMENT_ID, PRD_COMPARTMENT_NAME, PRD_COMPARTMENT_PATH, PRD_REGION, PRD_AVAILABILITY_DOMAIN, USG_RESOURCE_ID, "
-            sql += "USG_BILLED_QUANTITY, USG_CONSUMED_QUANTITY, USG_CONSUMED_UNITS, USG_CONSUMED_MEASURE, IS_CORRECTION, TAGS_DATA "
-            sql += ") VALUES ("
-            sql += ":1, :2, to_date(:3,'YYYY-MM-DD HH24:MI'), to_date(:4,'YYYY-MM-DD HH24:MI'), :5, :6, "
-            sql += ":7, :8, :9, :10, :11, :12, "
-            sql += "to_number(:13), to_number(:14), :15, :16, :17 ,:18 "
-            sql += ") "
+##########################################################################
+# Check Table Structure Stage - global temporary table with the columns
+# of the report table, the rows of a file are inserted to the stage and
+# moved to the partitioned report table by one insert select, a report
+# table which is not partitioned is loaded without the stage
+##########################################################################
+def check_database_table_structure_stage(connection, table_name):
+    try:
+        # open cursor
+        cursor = connection.cursor()
 
-            cursor.prepare(sql)
-            cursor.executemany(None, data)
-            connection.commit()
+        # partitioning is set when the report table is created
+        sql = "select count(*) from user_tables where table_name = :table_name and partitioned = 'YES'"
+        cursor.execute(sql, {"table_name": table_name})
+        val, = cursor.fetchone()
+        if val == 0:
+            print("   Table " + table_name + " is not partitioned, the rows will be inserted without the stage table")
+            logging.info("   Table " + table_name + " is not partitioned, the rows will be inserted without the stage table")
             cursor.close()
-            print("   Completed  file " + o.name + " - " + str(len(data)) + " Rows Inserted")
-            logging.info("   Completed  file " + o.name + " - " + str(len(data)) + " Rows Inserted")
-        num += 1
+            return
 
-        # remove file
-        os.remove(path_filename)
+        # check if stage table exist, if not create
+        sql = "select count(*) from user_tables where table_name = :table_name"
+        cursor.execute(sql, {"table_name": table_name + "_STAGE"})
+        val, = cursor.fetchone()
 
-        #######################################
-        # insert bulk tags to the database
-        #######################################
-        data = []
-        for tag in tags_keys:
-            row_data = (str(tenancy.name), tag, str(tenancy.name), tag)
-            data.append(row_data)
+        # if table not exist, create it
+        if val == 0:
+            print("   Table " + table_name + "_STAGE was not exist, creating")
+            sql = "CREATE GLOBAL TEMPORARY TABLE " + table_name + "_STAGE ON COMMIT DELETE ROWS "
+            sql += "AS SELECT * FROM " + table_name + " WHERE 1=0"
+            cursor.execute(sql)
+            print("   Table " + table_name + "_STAGE created")
+        else:
+            print("   Table " + table_name + "_STAGE exist")
+            logging.info("   Table " + table_name + "_STAGE exist")
 
-        if data:
-            cursor = cx_Oracle.Cursor(connection)
-            sql = "INSERT INTO OCI_USAGE_TAG_KEYS (TENANT_NAME , TAG_KEY) "
-            sql += "SELECT :1, :2 FROM DUAL "
-            sql += "WHERE NOT EXISTS (SELECT 1 FROM OCI_USAGE_TAG_KEYS B WHERE B.TENANT_NAME = :3 AND B.TAG_KEY = :4)"
+        stage_load_tables.add(table_name)
 
-            cursor.prepare(sql)
-            cursor.executemany(None, data)
-            connection.commit()
-            cursor.close()
-            print("   Total " + str(len(data)) + " Tags Merged.")
-            logging.info("   Total " + str(len(data)) + " Tags Merged.")
-        return num
+        # close cursor
+        cursor.close()
 
     except cx_Oracle.DatabaseError as e:
-        print("\nload_usage_file() - Error manipulating database - " + str(e) + "\n")
+        print("\nError manipulating database at check_database_table_structure_stage() - " + str(e) + "\n")
         raise SystemExit
 
     except Exception as e:
-        print("\nload_usage_file() - Error Download Usage and insert to database - " + str(e))
-        raise SystemExit
+        raise Exception("\nError manipulating database at check_database_table_structure_stage() - " + str(e))
 
 
 ##########################################################################
-# Main
+# Insert Report Stage - move the rows of the file from the stage table to
+# the report table, direct path in backfill mode, the stage is emptied by
+# the commit of the file
 ##########################################################################
-def main_process():
-    cmd = set_parser_arguments()
-    if cmd is None:
-        exit()
-    config, signer = create_signer(cmd)
+def insert_report_stage(connection, table_name, columns, backfill):
+    cursor = connection.cursor()
+    sql = "INSERT " + ("/*+ APPEND */ " if backfill else "") + "INTO " + table_name + " (" + columns + ") "
+    sql += "SELECT " + columns + " FROM " + table_name + "_STAGE"
+    cursor.execute(sql)
+    cursor.close()
+
+
+##########################################################################
+# Get Max Loaded File Id of the tenant and report type (USAGE or COST)
+# from OCI_LOAD_FILES, the first time it is taken from the report table
+# and recorded in OCI_LOAD_FILES, also as file id '0' if the tenant has
+# no rows yet, so the report table is scanned once per tenant
+##########################################################################
+def get_max_loaded_file_id(connection, tenant_name, report_type):
+    try:
+        cursor = connection.cursor()
+
+        sql = "select max(FILE_ID) from OCI_LOAD_FILES where TENANT_NAME=:tenant_name and REPORT_TYPE=:report_type"
+        cursor.execute(sql, {"tenant_name": str(tenant_name), "report_type": report_type})
+        max_file_id, = cursor.fetchone()
+
+        if max_file_id is None:
+            sql = "select nvl(max(file_id),'0') as file_id from OCI_" + report_type + " where TENANT_NAME=:tenant_name"
+            cursor.execute(sql, {"tenant_name": str(tenant_name)})
+            max_file_id, = cursor.fetchone()
+
+            insert_load_file(connection, tenant_name, report_type, max_file_id, None, None, None)
+            connection.commit()
+
+        cursor.close()
+        return max_file_id
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at get_max_loaded_file_id() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at get_max_loaded_file_id() - " + str(e))
+
+
+##########################################################################
+# Insert Load File - record a loaded file in OCI_LOAD_FILES
+# runs in the file transaction, commit is done by the caller
+##########################################################################
+def insert_load_file(connection, tenant_name, report_type, file_id, file_size, num_rows, load_seconds):
+    cursor = connection.cursor()
+    sql = "insert into OCI_LOAD_FILES (TENANT_NAME, REPORT_TYPE, FILE_ID, FILE_SIZE, NUM_ROWS, LOAD_SECONDS, LOAD_DATE, AGENT_VERSION) "
+    sql += "values (:tenant_name, :report_type, :file_id, :file_size, :num_rows, :load_seconds, sysdate, :version)"
+    cursor.execute(sql, {
+        "tenant_name": str(tenant_name),
+        "report_type": report_type,
+        "file_id": file_id,
+        "file_size": file_size,
+        "num_rows": num_rows,
+        "load_seconds": round(load_seconds, 3) if load_seconds is not None else None,
+        "version": version
+    })
+    cursor.close()
+
+
+##########################################################################
+# Check Table Structure for Load Metrics
+##########################################################################
+def check_database_table_structure_load_metrics(connection):
+    try:
+        # open cursor
+        cursor = connection.cursor()
+
+        # check if OCI_LOAD_METRICS table exist, if not create
+        sql = "select count(*) from user_tables where table_name = 'OCI_LOAD_METRICS'"
+        cursor.execute(sql)
+        val, = cursor.fetchone()
+
+        # if table not exist, create it
+        if val == 0:
+            print("   Table OCI_LOAD_METRICS was not exist, creating")
+            sql = "create table OCI_LOAD_METRICS ("
+            sql += "    TENANT_NAME             VARCHAR2(100),"
+            sql += "    REPORT_TYPE             VARCHAR2(10),"
+            sql += "    FILE_ID                 VARCHAR2(30),"
+            sql += "    LOAD_DATE               DATE,"
+            sql += "    FILE_SIZE               NUMBER,"
+            sql += "    NUM_ROWS                NUMBER,"
+            sql += "    DOWNLOAD_BYTES          NUMBER,"
+            sql += "    DOWNLOAD_SECONDS        NUMBER,"
+            sql += "    PARSE_SECONDS           NUMBER,"
+            sql += "    WAIT_SECONDS            NUMBER,"
+            sql += "    INSERT_SECONDS          NUMBER,"
+            sql += "    STATS_SECONDS           NUMBER,"
+            sql += "    COMMIT_SECONDS          NUMBER,"
+            sql += "    AGENT_VERSION           VARCHAR2(30)"
+            sql += ") "
+            cursor.execute(sql)
+            print("   Table OCI_LOAD_METRICS created")
+        else:
+            print("   Table OCI_LOAD_METRICS exist")
+            logging.info("   Table OCI_LOAD_METRICS exist")
+
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at check_database_table_structure_load_metrics() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at check_database_table_structure_load_metrics() - " + str(e))
+
+
+##########################################################################
+# Insert Load Metrics - the metrics of the files loaded for a tenant
+# in OCI_LOAD_METRICS, after the files were committed
+##########################################################################
+def insert_load_metrics(connection, tenant_name, report_type, files):
+    try:
+        if not files:
+            return
+
+        cursor = connection.cursor()
+        sql = "insert into OCI_LOAD_METRICS (TENANT_NAME, REPORT_TYPE, FILE_ID, LOAD_DATE, FILE_SIZE, NUM_ROWS, DOWNLOAD_BYTES, DOWNLOAD_SECONDS, "
+        sql += "PARSE_SECONDS, WAIT_SECONDS, INSERT_SECONDS, STATS_SECONDS, COMMIT_SECONDS, AGENT_VERSION) "
+        sql += "values (:tenant_name, :report_type, :file_id, sysdate, :file_size, :num_rows, :download_bytes, :download_seconds, "
+        sql += ":parse_seconds, :wait_seconds, :insert_seconds, :stats_seconds, :commit_seconds, :version)"
+
+        data = []
+        for f in files:
+            data.append({
+                "tenant_name": str(tenant_name),
+                "report_type": report_type,
+                "file_id": f['file_name'].rsplit('/', 1)[-1][:-7],
+                "file_size": f['file_size'],
+                "num_rows": f['rows'],
+                "download_bytes": f['bytes'],
+                "download_seconds": f['download_seconds'],
+                "parse_seconds": f['parse_seconds'],
+                "wait_seconds": f['wait_seconds'],
+                "insert_seconds": f['insert_seconds'],
+                "stats_seconds": f['stats_seconds'],
+                "commit_seconds": f['commit_seconds'],
+                "version": version
+            })
+
+        cursor.executemany(sql, data)
+        connection.commit()
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at insert_load_metrics() - " + str(e) + "\n")
+
+    except Exception as e:
+        print("\nError inserting load metrics at insert_load_metrics() - " + str(e))
+
+
+##########################################################################
+# Check Table Structure for SKU Repairs
+##########################################################################
+def check_database_table_structure_sku_repairs(connection):
+    try:
+        # open cursor
+        cursor = connection.cursor()
+
+        # check if OCI_SKU_REPAIRS table exist, if not create
+        sql = "select count(*) from user_tables where table_name = 'OCI_SKU_REPAIRS'"
+        cursor.execute(sql)
+        val, = cursor.fetchone()
+
+        # if table not exist, create it
+        if val == 0:
+            print("   Table OCI_SKU_REPAIRS was not exist, creating")
+            sql = "create table OCI_SKU_REPAIRS ("
+            sql += "    COST_PRODUCT_SKU        VARCHAR2(10),"
+            sql += "    PRD_DESCRIPTION         VARCHAR2(1000),"
+            sql += "    COST_BILLING_UNIT       VARCHAR2(1000),"
+            sql += "    CONSTRAINT OCI_SKU_REPAIRS_PK PRIMARY KEY (COST_PRODUCT_SKU) "
+            sql += ") "
+            cursor.execute(sql)
+            print("   Table OCI_SKU_REPAIRS created")
+        else:
+            print("   Table OCI_SKU_REPAIRS exist")
+            logging.info("   Table OCI_SKU_REPAIRS exist")
+
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at check_database_table_structure_sku_repairs() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at check_database_table_structure_sku_repairs() - " + str(e))
+
+
+##########################################################################
+# Load SKU Repairs from OCI_SKU_REPAIRS
+##########################################################################
+def load_sku_repairs(connection):
+    cursor = connection.cursor()
+    cursor.execute("select COST_PRODUCT_SKU, PRD_DESCRIPTION, COST_BILLING_UNIT from OCI_SKU_REPAIRS")
+    repairs = {}
+    for sku, description, billing_unit in cursor.fetchall():
+        repairs[sku] = (description or "", billing_unit or "")
+    cursor.close()
+    return repairs
+
+
+##########################################################################
+# Load SKU Repairs from csv file - SKU, product description, billing unit
+# lines starting with # are comments
+##########################################################################
+def load_sku_repairs_file(repairs_file):
+    repairs = {}
+    with open(repairs_file, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) != 3:
+                raise ValueError("SKU repair line should be SKU, description, billing unit - " + ",".join(row))
+            repairs[row[0].strip()] = (row[1], row[2])
+    return repairs
+
+
+##########################################################################
+# Update SKU Repairs - add repairs to sku_repairs, also the initializer
+# of the transform processes which do not inherit it
+##########################################################################
+def update_sku_repairs(repairs):
+    sku_repairs.update(repairs)
+
+
+##########################################################################
+# Prepare Backfill - direct path load of a report table
+# the index is marked unusable and rebuilt by check_database_index_structure
+# at the end of the load
+##########################################################################
+def prepare_backfill(connection, table_name):
+    try:
+        cursor = connection.cursor()
+
+        print("\nPreparing " + table_name + " for backfill...")
+        logging.info("Preparing " + table_name + " for backfill...")
+
+        sql = "select count(*) from user_indexes where table_name = :table_name and index_name = :index_name"
+        cursor.execute(sql, {"table_name": table_name, "index_name": table_name + "_1IX"})
+        val, = cursor.fetchone()
+        if val > 0:
+            cursor.execute("ALTER INDEX " + table_name + "_1IX UNUSABLE")
+            print("   Index " + table_name + "_1IX marked unusable, will be rebuilt at the end of the load")
+            logging.info("   Index " + table_name + "_1IX marked unusable, will be rebuilt at the end of the load")
+
+        cursor.close()
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at prepare_backfill() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at prepare_backfill() - " + str(e))
+
+
+##########################################################################
+# Backfill Marker - a file loaded by direct path is recorded in
+# OCI_LOAD_FILES as REPORT_TYPE USAGE_BF or COST_BF before its first batch
+# is committed, the marker is removed in the transaction which records the
+# file as loaded, a marker left by a killed run is cleaned on the next run
+##########################################################################
+def insert_backfill_marker(connection, tenant_name, report_type, file_id):
+    insert_load_file(connection, tenant_name, report_type + "_BF", file_id, None, None, None)
+    connection.commit()
+
+
+##########################################################################
+# Delete Backfill Marker - runs in the file transaction, commit is done
+# by the caller
+##########################################################################
+def delete_backfill_marker(connection, tenant_name, report_type, file_id):
+    cursor = connection.cursor()
+    sql = "delete from OCI_LOAD_FILES where TENANT_NAME = :tenant_name and REPORT_TYPE = :report_type and FILE_ID = :file_id"
+    cursor.execute(sql, {"tenant_name": str(tenant_name), "report_type": report_type + "_BF", "file_id": file_id})
+    cursor.close()
+
+
+##########################################################################
+# Delete Backfill Report Files - rows of the files with a backfill marker,
+# committed by the direct path batches of a run which was killed, runs
+# on every run before the max loaded file id is read
+##########################################################################
+def delete_backfill_report_files(connection, tenant_name, report_type):
+    try:
+        cursor = connection.cursor()
+
+        sql = "select FILE_ID from OCI_LOAD_FILES where TENANT_NAME = :tenant_name and REPORT_TYPE = :report_type order by FILE_ID"
+        cursor.execute(sql, {"tenant_name": str(tenant_name), "report_type": report_type + "_BF"})
+        file_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+
+        for file_id in file_ids:
+            num_rows = delete_report_file(connection, "OCI_" + report_type, tenant_name, report_type, file_id)
+            print("   Removed " + str(num_rows) + " rows from OCI_" + report_type + " of file " + file_id + " not completed by a previous backfill")
+            logging.info("   Removed " + str(num_rows) + " rows from OCI_" + report_type + " of file " + file_id + " not completed by a previous backfill")
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at delete_backfill_report_files() - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        raise Exception("\nError manipulating database at delete_backfill_report_files() - " + str(e))
+
+
+##########################################################################
+# Insert Report Batches - array insert of the batches of a file
+# the binds are declared by input_sizes, so they are not rebound when
+# the strings grow between the batches
+# in backfill mode the insert is direct path (APPEND_VALUES) and every
+# batch has to be committed before the table is modified again (ORA-12838)
+##########################################################################
+def insert_report_batches(connection, cursor, batches, input_sizes, direct_path, metrics):
+    num_rows = 0
+    wait_time = time.time()
+    for data in batches:
+        insert_time = time.time()
+        metrics['wait_seconds'] += insert_time - wait_time
+
+        cursor.setinputsizes(*input_sizes)
+        cursor.executemany(None, data)
+        num_rows += len(data)
+        if direct_path:
+            connection.commit()
+
+        wait_time = time.time()
+        metrics['insert_seconds'] += wait_time - insert_time
+
+    metrics['wait_seconds'] += time.time() - wait_time
+    return num_rows
+
+
+##########################################################################
+# Delete Report File - remove the rows of a file committed by a backfill
+# batch when the load of the file failed, and its backfill marker
+# returns the number of rows removed
+##########################################################################
+def delete_report_file(connection, table_name, tenant_name, report_type, file_id):
+    connection.rollback()
+    cursor = connection.cursor()
+    sql = "delete from " + table_name + " where TENANT_NAME = :tenant_name and FILE_ID = :file_id"
+    cursor.execute(sql, {"tenant_name": str(tenant_name), "file_id": file_id})
+    num_rows = cursor.rowcount
+    cursor.close()
+    delete_backfill_marker(connection, tenant_name, report_type, file_id)
+    connection.commit()
+    return num_rows
+
+
+#########################################################################
+# Save Report Rejects - the rows of a file which were rejected for
+# malformed dates or numbers, with the reason as the first column
+##########################################################################
+def save_report_rejects(tenant_name, report_type, file_id, rejects):
+    reject_filename = work_report_dir + "/rejects_" + str(tenant_name) + "_" + report_type + "_" + file_id + ".csv"
+    with open(reject_filename, 'w', newline='') as f:
+        csv_writer = csv.writer(f)
+        for reason, row in rejects:
+            csv_writer.writerow([reason] + row)
+
+    print("   " + str(len(rejects)) + " Rows Rejected, saved to " + reject_filename)
+    logging.info("   " + str(len(rejects)) + " Rows Rejected, saved to " + reject_filename)
+
+
+#########################################################################
+# Open Report File
+# replay mode reads the file from the replay dir, with the report cache
+# the object is read from the cache or downloaded to it, otherwise it is
+# streamed or downloaded to the work dir
+##########################################################################
+@contextlib.contextmanager
+def open_report_file(object_storage, tenancy, object_file, cmd, metrics):
+
+    # replay mode - local file, no Object Storage
+    if cmd.replay_dir:
+        with gzip.open(get_replay_file(cmd.replay_dir, object_file.name), 'rt') as file_in:
+            yield file_in
+        return
+
+    # report cache - download once, keyed by the object name and etag
+    if cmd.cache_dir:
+        with open_report_cache_file(object_storage, tenancy, object_file, cmd, metrics) as f:
+            with gzip.open(f, 'rt') as file_in:
+                yield file_in
+        return
+
+    start_time = time.time()
+    object_details = object_storage.get_object(usage_report_namespace, str(tenancy.id), object_file.name)
+    metrics['download_seconds'] += time.time() - start_time
+
+    # stream mode - decompress the object while it is read from the network, no local file
+    if cmd.stream:
+        try:
+            with gzip.open(MeteredStream(object_details.data.raw, metrics), 'rt') as file_in:
+                yield file_in
+        finally:
+            object_details.data.raw.close()
+        return
+
+    # download the file to the work dir and read it from there
+    path_filename = work_report_dir + '/' + str(tenancy.name) + '_' + '_'.join(object_file.name.rsplit('/', 2)[-2:])
+    try:
+        download_report_file(object_details, path_filename, metrics)
+
+        with gzip.open(path_filename, 'rt') as file_in:
+            yield file_in
+
+    finally:
+        # remove file
+        if os.path.exists(path_filename):
+            os.remove(path_filename)
+
+
+##########################################################################
+# Download the object to a local file in chunks of 1MB
+##########################################################################
+def download_report_file(object_details, path_filename, metrics):
+    start_time = time.time()
+    with open(path_filename, 'wb') as f:
+        for chunk in object_details.data.raw.stream(1024 * 1024, decode_content=False):
+            f.write(chunk)
+            metrics['bytes'] += len(chunk)
+    metrics['download_seconds'] += time.time() - start_time
+
+
+##########################################################################
+# Metered Stream - object stream of --stream mode which adds the bytes
+# and the time of the network reads to the file metrics, the rest of the
+# read time is decompress and parse
+##########################################################################
+class MeteredStream(object):
+    def __init__(self, raw, metrics):
+        self.raw = raw
+        self.metrics = metrics
+
+    def read(self, size=-1):
+        start_time = time.time()
+        data = self.raw.read(size)
+        self.metrics['download_seconds'] += time.time() - start_time
+        self.metrics['bytes'] += len(data)
+        return data
+
+
+##########################################################################
+# Open Report Cache File - open the object in the report cache,
+# cache_dir/tenancy id/report dir/file id_etag.csv.gz, the object is
+# downloaded if it is not in the cache, a hit refreshes its time for LRU
+# the file is opened before the eviction so it cannot be removed under it
+##########################################################################
+def open_report_cache_file(object_storage, tenancy, object_file, cmd, metrics):
+    report_dir, file_name = object_file.name.rsplit('/', 2)[-2:]
+    object_key = str(object_file.etag or object_file.size).replace('/', '_').replace('"', '')
+    cache_path = os.path.join(cmd.cache_dir, str(tenancy.id), report_dir)
+    cache_file = os.path.join(cache_path, file_name[:-7] + "_" + object_key + ".csv.gz")
+
+    try:
+        f = open(cache_file, 'rb')
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return f
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(cache_path, exist_ok=True)
+    start_time = time.time()
+    object_details = object_storage.get_object(usage_report_namespace, str(tenancy.id), object_file.name)
+    metrics['download_seconds'] += time.time() - start_time
+
+    # download to temp file and rename, so the cache never holds a partial object
+    temp_file = cache_file + "." + str(threading.get_ident()) + ".tmp"
+    try:
+        download_report_file(object_details, temp_file, metrics)
+        os.replace(temp_file, cache_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    f = open(cache_file, 'rb')
+    evict_report_cache(cmd.cache_dir, cmd.cache_size * 1024 * 1024, cache_file)
+    return f
+
+
+##########################################################################
+# Evict Report Cache - remove the least recently used files until the
+# cache is not bigger than max_bytes, keep_file was just added
+##########################################################################
+def evict_report_cache(cache_dir, max_bytes, keep_file):
+    with report_cache_lock:
+        files = []
+        total_bytes = 0
+        for path, dirs, names in os.walk(cache_dir):
+            for name in names:
+                if not name.endswith(".csv.gz"):
+                    continue
+                file_name = os.path.join(path, name)
+                try:
+                    stat = os.stat(file_name)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file_name))
+                total_bytes += stat.st_size
+
+        files.sort()
+        for mtime, size, file_name in files:
+            if total_bytes <= max_bytes:
+                break
+            if file_name == keep_file:
+                continue
+            try:
+                os.remove(file_name)
+                total_bytes -= size
+            except OSError:
+                pass
+
+
+##########################################################################
+# Replay files - report files of the replay dir, laid out as the bucket,
+# replay_dir/usage-csv/*.csv.gz and replay_dir/cost-csv/*.csv.gz
+##########################################################################
+def get_replay_file(replay_dir, object_name):
+    report_dir, file_name = object_name.rsplit('/', 2)[-2:]
+    return os.path.join(replay_dir, report_dir, file_name)
+
+
+def list_replay_objects(replay_dir, prefix, start):
+    report_dir = prefix.rstrip('/').rsplit('/', 1)[-1]
+    path = os.path.join(replay_dir, report_dir)
+    objects = []
+    if not os.path.isdir(path):
+        return objects
+
+    for file_name in sorted(os.listdir(path)):
+        object_name = prefix + file_name
+        if not file_name.endswith(".csv.gz") or object_name < start:
+            continue
+        stat = os.stat(os.path.join(path, file_name))
+        objects.append(oci.object_storage.models.ObjectSummary(
+            name=object_name,
+            size=stat.st_size,
+            time_created=datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc)
+        ))
+    return objects
+
+
+##########################################################################
+# Transform Cost Rows - csv rows of a cost file to the rows to insert
+# report is (tenant name, file id, header), the values for the stats,
+# reference and price list tables are collected to file_summary
+##########################################################################
+def transform_cost_rows(rows, report, compartments, file_summary):
+    tenant_name, file_id, header = report
+    tags_keys = file_summary['tags_keys']
+    file_stats = file_summary['stats']
+    file_references = file_summary['references']
+    file_skus = file_summary['skus']
+    file_prices = file_summary['prices']
+    file_repairs = file_summary['repairs']
+    repairs = sku_repairs
+
+    # resolve the columns positions from the header once per file
+    num_columns = len(header)
+    get_columns = get_report_columns(header, cost_file_columns)
+    tags_columns = get_report_tags_columns(header)
+
+    for row in rows:
+
+        # blank lines are skipped, as DictReader did
+        if not row:
+            continue
+
+        # pad or cut the row to the header size, missing columns read the empty value appended at the end
+        if len(row) != num_columns:
+            row = (row + [""] * num_columns)[:num_columns]
+        row.append("")
+
+        # Assign each column to variable
+        (
+            lineItem_intervalUsageStart,
+            lineItem_intervalUsageEnd,
+            product_service,
+            product_compartmentId,
+            product_compartmentName,
+            product_region,
+            product_availabilityDomain,
+            product_resourceId,
+            usage_billedQuantity,
+            usage_billedQuantityOverage,
+            cost_subscriptionId,
+            cost_productSku,
+            product_Description,
+            cost_unitPrice,
+            cost_unitPriceOverage,
+            cost_myCost,
+            cost_myCostOverage,
+            cost_currencyCode,
+            cost_billingUnitReadable,
+            cost_overageFlag,
+            lineItem_isCorrection,
+        ) = get_columns(row)
+
+        # convert the dates and numbers, malformed rows are rejected
+        try:
+            usage_interval_start = get_report_date(lineItem_intervalUsageStart)
+            usage_interval_end = get_report_date(lineItem_intervalUsageEnd)
+            usage_billed_quantity = get_report_number(usage_billedQuantity)
+            usage_billed_quantity_overage = get_report_number(usage_billedQuantityOverage)
+            cost_subscription_id = get_report_number(cost_subscriptionId)
+            cost_unit_price = get_report_number(cost_unitPrice)
+            cost_unit_price_overage = get_report_number(cost_unitPriceOverage)
+            cost_my_cost = get_report_number(cost_myCost)
+            cost_my_cost_overage = get_report_number(cost_myCostOverage)
+        except ValueError as e:
+            file_summary['rejects'].append((str(e), row[:-1]))
+            continue
+
+        # find compartment path
+        compartment_path = get_compartment_path(compartments, product_compartmentId)
+
+        # Handle Tags up to 4000 chars with # seperator
+        tags_data = get_tags_data(row, tags_columns, tags_keys)
+
+        # Fix OCI Data for missing product description
+        if product_Description == "":
+            repair = repairs.get(cost_productSku)
+            if repair is not None:
+                product_Description, cost_billingUnitReadable = repair
+                file_repairs[cost_productSku] = file_repairs.get(cost_productSku, 0) + 1
+
+        # create array
+        row_data = (
+            tenant_name,
+            file_id,
+            usage_interval_start,
+            usage_interval_end,
+            product_service,
+            product_compartmentId,
+            product_compartmentName,
+            compartment_path,
+            product_region,
+            product_availabilityDomain,
+            product_resourceId,
+            usage_billed_quantity,
+            usage_billed_quantity_overage,
+            cost_subscription_id,
+            cost_productSku,
+            product_Description,
+            cost_unit_price,
+            cost_unit_price_overage,
+            cost_my_cost,
+            cost_my_cost_overage,
+            cost_currencyCode,
+            cost_billingUnitReadable,
+            cost_overageFlag,
+            lineItem_isCorrection,
+            tags_data
+        )
+        # keep the file statistics for OCI_COST_STATS
+        add_cost_stats(file_stats, row_data)
+
+        # keep the reference values for OCI_COST_REFERENCE
+        file_references.add((product_service, product_compartmentName, compartment_path, product_region, cost_subscriptionId))
+        add_sku_description(file_skus, cost_productSku, product_Description)
+
+        # keep the latest price of the sku for OCI_PRICE_LIST
+        add_cost_price(file_prices, cost_productSku, (usage_interval_start, product_Description, cost_currencyCode, cost_unit_price))
+
+        yield row_data
+
+
+#########################################################################
+# Read Cost File - download the file and transform the rows, runs in the worker
+# threads, generate the rows one by one, the values collected from the rows are
+# kept in file_summary
+##########################################################################
+def read_cost_file(object_storage, object_file, cmd, tenancy, compartments, file_summary):
+    try:
+        o = object_file
+
+        # get file id
+        file_id = o.name.rsplit('/', 1)[-1][:-7]
+
+        # download file and stream the rows
+        with open_report_file(object_storage, tenancy, o, cmd, file_summary['metrics']) as file_in:
+            csv_reader = csv.reader(file_in)
+            header = next(csv_reader, [])
+
+            for row_data in transform_report_rows(transform_cost_rows, csv_reader, (str(tenancy.name), file_id, header), compartments, file_summary, cmd):
+                yield row_data
+
+    except Exception as e:
+        print("\nread_cost_file() - Error Download Cost File " + object_file.name + " - " + str(e))
+        raise SystemExit
+
+
+#########################################################################
+# Load Cost File - insert the batches read by read_cost_file to the database
+# the file, its statistics, new tag keys and OCI_LOAD_FILES row are committed once after all
+# its batches are inserted
+##########################################################################
+def load_cost_file(connection, object_file, batches, file_summary, known_tags_keys, tenancy, cmd):
+    num = 0
+    start_time = time.time()
+    try:
+        o = object_file
+        file_id = o.name.rsplit('/', 1)[-1][:-7]
+
+        # insert bulk to database
+        cursor = connection.cursor()
+        columns = "TENANT_NAME,"
+        columns += "FILE_ID,"
+        columns += "USAGE_INTERVAL_START, "
+        columns += "USAGE_INTERVAL_END, "
+        columns += "PRD_SERVICE, "
+        # 6
+        columns += "PRD_COMPARTMENT_ID, "
+        columns += "PRD_COMPARTMENT_NAME, "
+        columns += "PRD_COMPARTMENT_PATH, "
+        columns += "PRD_REGION, "
+        columns += "PRD_AVAILABILITY_DOMAIN, "
+        # 11
+        columns += "USG_RESOURCE_ID, "
+        columns += "USG_BILLED_QUANTITY, "
+        columns += "USG_BILLED_QUANTITY_OVERAGE, "
+        columns += "COST_SUBSCRIPTION_ID, "
+        columns += "COST_PRODUCT_SKU, "
+        # 16
+        columns += "PRD_DESCRIPTION, "
+        columns += "COST_UNIT_PRICE, "
+        columns += "COST_UNIT_PRICE_OVERAGE, "
+        columns += "COST_MY_COST, "
+        columns += "COST_MY_COST_OVERAGE, "
+        # 21
+        columns += "COST_CURRENCY_CODE, "
+        columns += "COST_BILLING_UNIT, "
+        columns += "COST_OVERAGE_FLAG,"
+        columns += "IS_CORRECTION, "
+        columns += "TAGS_DATA "
+
+        # partitioned table is loaded by the stage table, the file is moved by one insert select
+        stage_load = "OCI_COST" in stage_load_tables
+        table_name = "OCI_COST_STAGE" if stage_load else "OCI_COST"
+        direct_path = cmd.backfill and not stage_load
+
+        sql = "INSERT " + ("/*+ APPEND_VALUES */ " if direct_path else "") + "INTO " + table_name + " (" + columns + ") VALUES ("
+        sql += ":1, :2, :3, :4, :5,  "
+        sql += ":6, :7, :8, :9, :10, "
+        sql += ":11, :12, :13 ,:14, :15, "
+        sql += ":16, :17, :18, :19, :20, "
+        sql += ":21, :22, :23, :24, :25"
+        sql += ") "
+
+        # bind types and max sizes of the columns
+        input_sizes = [100, 30, cx_Oracle.DATETIME, cx_Oracle.DATETIME, 100,
+                       100, 100, 1000, 100, 100,
+                       1000, cx_Oracle.NUMBER, cx_Oracle.NUMBER, cx_Oracle.NUMBER, 10,
+                       1000, cx_Oracle.NUMBER, cx_Oracle.NUMBER, cx_Oracle.NUMBER, cx_Oracle.NUMBER,
+                       10, 1000, 10, 10, 4000]
+
+        cursor.prepare(sql)
+        metrics = file_summary['metrics']
+        try:
+            if direct_path:
+                insert_backfill_marker(connection, tenancy.name, "COST", file_id)
+            num_rows = insert_report_batches(connection, cursor, batches, input_sizes, direct_path, metrics)
+            step_time = time.time()
+            if stage_load:
+                insert_report_stage(connection, "OCI_COST", columns, cmd.backfill)
+
+            # merge the statistics of the file and record it as loaded in the same transaction
+            stats_time = time.time()
+            merge_cost_stats(connection, tenancy.name, file_id, file_summary['stats'])
+            merge_tag_keys(connection, "OCI_COST_TAG_KEYS", tenancy.name, known_tags_keys, file_summary['tags_keys'])
+            insert_load_file(connection, tenancy.name, "COST", file_id, o.size, num_rows, time.time() - start_time)
+            if direct_path:
+                delete_backfill_marker(connection, tenancy.name, "COST", file_id)
+
+            commit_time = time.time()
+            connection.commit()
+
+            metrics['insert_seconds'] += stats_time - step_time
+            metrics['stats_seconds'] += commit_time - stats_time
+            metrics['commit_seconds'] += time.time() - commit_time
+            metrics['rows'] = num_rows
+        except BaseException as e:
+            # backfill batches are already committed, remove them, if the delete
+            # fails too the marker of the file is cleaned by the next run
+            if direct_path:
+                print("\nload_cost_file() - Error loading file " + o.name + ", removing its backfill rows - " + str(e))
+                logging.info("load_cost_file() - Error loading file " + o.name + ", removing its backfill rows - " + str(e))
+                try:
+                    delete_report_file(connection, "OCI_COST", tenancy.name, "COST", file_id)
+                except Exception as delete_error:
+                    print("\nload_cost_file() - Error removing the backfill rows of file " + o.name + " - " + str(delete_error))
+                    logging.info("load_cost_file() - Error removing the backfill rows of file " + o.name + " - " + str(delete_error))
+            raise
+        cursor.close()
+
+        if file_summary['rejects']:
+            save_report_rejects(tenancy.name, "cost", file_id, file_summary['rejects'])
+        print("   Completed  file " + o.name + " - " + str(num_rows) + " Rows Inserted, Peak RSS " + get_peak_rss_mb() + " MB")
+        logging.info("   Completed  file " + o.name + " - " + str(num_rows) + " Rows Inserted, Peak RSS " + get_peak_rss_mb() + " MB")
+        num += 1
+        return num
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nload_cost_file() - Error manipulating database - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        print("\nload_cost_file() - Error insert to database - " + str(e))
+        raise SystemExit
+
+
+##########################################################################
+# Transform Usage Rows - csv rows of a usage file to the rows to insert
+# report is (tenant name, file id, header), the tag keys and the stats
+# are collected to file_summary
+##########################################################################
+def transform_usage_rows(rows, report, compartments, file_summary):
+    tenant_name, file_id, header = report
+    tags_keys = file_summary['tags_keys']
+    file_stats = file_summary['stats']
+
+    # resolve the columns positions from the header once per file
+    num_columns = len(header)
+    get_columns = get_report_columns(header, usage_file_columns)
+    tags_columns = get_report_tags_columns(header)
+
+    for row in rows:
+
+        # blank lines are skipped, as DictReader did
+        if not row:
+            continue
+
+        # pad or cut the row to the header size, missing columns read the empty value appended at the end
+        if len(row) != num_columns:
+            row = (row + [""] * num_columns)[:num_columns]
+        row.append("")
+
+        # Assign each column to variable
+        (
+            lineItem_intervalUsageStart,
+            lineItem_intervalUsageEnd,
+            product_service,
+            product_resource,
+            product_compartmentId,
+            product_compartmentName,
+            product_region,
+            product_availabilityDomain,
+            product_resourceId,
+            usage_billedQuantity,
+            usage_consumedQuantity,
+            usage_consumedQuantityUnits,
+            usage_consumedQuantityMeasure,
+            lineItem_isCorrection,
+        ) = get_columns(row)
+
+        # convert the dates and numbers, malformed rows are rejected
+        try:
+            usage_interval_start = get_report_date(lineItem_intervalUsageStart)
+            usage_interval_end = get_report_date(lineItem_intervalUsageEnd)
+            usage_billed_quantity = get_report_number(usage_billedQuantity)
+            usage_consumed_quantity = get_report_number(usage_consumedQuantity)
+        except ValueError as e:
+            file_summary['rejects'].append((str(e), row[:-1]))
+            continue
+
+        # find compartment path
+        compartment_path = get_compartment_path(compartments, product_compartmentId)
+
+        # Handle Tags up to 4000 chars with # seperator
+        tags_data = get_tags_data(row, tags_columns, tags_keys)
+
+        # create array for bulk insert
+        row_data = (
+            tenant_name,
+            file_id,
+            usage_interval_start,
+            usage_interval_end,
+            product_service,
+            product_resource,
+            product_compartmentId,
+            product_compartmentName,
+            compartment_path,
+            product_region,
+            product_availabilityDomain,
+            product_resourceId,
+            usage_billed_quantity,
+            usage_consumed_quantity,
+            usage_consumedQuantityUnits,
+            usage_consumedQuantityMeasure,
+            lineItem_isCorrection,
+            tags_data
+        )
+        # keep the file statistics for OCI_USAGE_STATS
+        file_stats[row_data[2]] = file_stats.get(row_data[2], 0) + 1
+
+        yield row_data
+
+
+#########################################################################
+# Read Usage File - download the file and transform the rows, runs in the worker
+# threads, generate the rows one by one, the values collected from the rows are
+# kept in file_summary
+##########################################################################
+def read_usage_file(object_storage, object_file, cmd, tenancy, compartments, file_summary):
+    try:
+        o = object_file
+
+        # get file id
+        file_id = o.name.rsplit('/', 1)[-1][:-7]
+
+        # download file and stream the rows
+        with open_report_file(object_storage, tenancy, o, cmd, file_summary['metrics']) as file_in:
+            csv_reader = csv.reader(file_in)
+            header = next(csv_reader, [])
+
+            for row_data in transform_report_rows(transform_usage_rows, csv_reader, (str(tenancy.name), file_id, header), compartments, file_summary, cmd):
+                yield row_data
+
+    except Exception as e:
+        print("\nread_usage_file() - Error Download Usage File " + object_file.name + " - " + str(e))
+        raise SystemExit
+
+
+#########################################################################
+# Load Usage File - insert the batches read by read_usage_file to the database
+# the file, its statistics, new tag keys and OCI_LOAD_FILES row are committed once after all
+# its batches are inserted
+##########################################################################
+def load_usage_file(connection, object_file, batches, file_summary, known_tags_keys, tenancy, cmd):
+    num = 0
+    start_time = time.time()
+    try:
+        o = object_file
+        file_id = o.name.rsplit('/', 1)[-1][:-7]
+
+        # insert bulk to database
+        cursor = connection.cursor()
+        columns = "TENANT_NAME , FILE_ID, USAGE_INTERVAL_START, USAGE_INTERVAL_END, PRD_SERVICE, PRD_RESOURCE, "
+        columns += "PRD_COMPARTMENT_ID, PRD_COMPARTMENT_NAME, PRD_COMPARTMENT_PATH, PRD_REGION, PRD_AVAILABILITY_DOMAIN, USG_RESOURCE_ID, "
+        columns += "USG_BILLED_QUANTITY, USG_CONSUMED_QUANTITY, USG_CONSUMED_UNITS, USG_CONSUMED_MEASURE, IS_CORRECTION, TAGS_DATA "
+
+        # partitioned table is loaded by the stage table, the file is moved by one insert select
+        stage_load = "OCI_USAGE" in stage_load_tables
+        table_name = "OCI_USAGE_STAGE" if stage_load else "OCI_USAGE"
+        direct_path = cmd.backfill and not stage_load
+
+        sql = "INSERT " + ("/*+ APPEND_VALUES */ " if direct_path else "") + "INTO " + table_name + " (" + columns + ") VALUES ("
+        sql += ":1, :2, :3, :4, :5, :6, "
+        sql += ":7, :8, :9, :10, :11, :12, "
+        sql += ":13, :14, :15, :16, :17 ,:18 "
+        sql += ") "
+
+        # bind types and max sizes of the columns
+        input_sizes = [100, 30, cx_Oracle.DATETIME, cx_Oracle.DATETIME, 100, 100,
+                       100, 100, 1000, 100, 100, 1000,
+                       cx_Oracle.NUMBER, cx_Oracle.NUMBER, 100, 100, 10, 4000]
+
+        cursor.prepare(sql)
+        metrics = file_summary['metrics']
+        try:
+            if direct_path:
+                insert_backfill_marker(connection, tenancy.name, "USAGE", file_id)
+            num_rows = insert_report_batches(connection, cursor, batches, input_sizes, direct_path, metrics)
+            step_time = time.time()
+            if stage_load:
+                insert_report_stage(connection, "OCI_USAGE", columns, cmd.backfill)
+
+            # merge the statistics of the file and record it as loaded in the same transaction
+            stats_time = time.time()
+            merge_usage_stats(connection, tenancy.name, file_id, file_summary['stats'])
+            merge_tag_keys(connection, "OCI_USAGE_TAG_KEYS", tenancy.name, known_tags_keys, file_summary['tags_keys'])
+            insert_load_file(connection, tenancy.name, "USAGE", file_id, o.size, num_rows, time.time() - start_time)
+            if direct_path:
+                delete_backfill_marker(connection, tenancy.name, "USAGE", file_id)
+
+            commit_time = time.time()
+            connection.commit()
+
+            metrics['insert_seconds'] += stats_time - step_time
+            metrics['stats_seconds'] += commit_time - stats_time
+            metrics['commit_seconds'] += time.time() - commit_time
+            metrics['rows'] = num_rows
+        except BaseException as e:
+            # backfill batches are already committed, remove them, if the delete
+            # fails too the marker of the file is cleaned by the next run
+            if direct_path:
+                print("\nload_usage_file() - Error loading file " + o.name + ", removing its backfill rows - " + str(e))
+                logging.info("load_usage_file() - Error loading file " + o.name + ", removing its backfill rows - " + str(e))
+                try:
+                    delete_report_file(connection, "OCI_USAGE", tenancy.name, "USAGE", file_id)
+                except Exception as delete_error:
+                    print("\nload_usage_file() - Error removing the backfill rows of file " + o.name + " - " + str(delete_error))
+                    logging.info("load_usage_file() - Error removing the backfill rows of file " + o.name + " - " + str(delete_error))
+            raise
+        cursor.close()
+
+        if file_summary['rejects']:
+            save_report_rejects(tenancy.name, "usage", file_id, file_summary['rejects'])
+        print("   Completed  file " + o.name + " - " + str(num_rows) + " Rows Inserted, Peak RSS " + get_peak_rss_mb() + " MB")
+        logging.info("   Completed  file " + o.name + " - " + str(num_rows) + " Rows Inserted, Peak RSS " + get_peak_rss_mb() + " MB")
+        num += 1
+        return num
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nload_usage_file() - Error manipulating database - " + str(e) + "\n")
+        raise SystemExit
+
+    except Exception as e:
+        print("\nload_usage_file() - Error insert to database - " + str(e))
+        raise SystemExit
+
+
+#########################################################################
+# List the report files after the max file id of a report prefix,
+# from Object Storage or from the replay dir, generated in name order
+# Object Storage is listed by pages until next_start_with is empty, the
+# next page is fetched while the files of the current page are loaded
+##########################################################################
+def list_report_objects(object_storage, tenancy, prefix, max_file_id, cmd):
+    if cmd.replay_dir:
+        for o in list_replay_objects(cmd.replay_dir, prefix, prefix + max_file_id):
+            yield o
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        page = executor.submit(list_report_objects_page, object_storage, tenancy, prefix, prefix + max_file_id)
+        while page is not None:
+            objects = page.result()
+            page = None
+            if objects.next_start_with:
+                page = executor.submit(list_report_objects_page, object_storage, tenancy, prefix, objects.next_start_with)
+
+            for o in objects.objects:
+                yield o
+
+
+#########################################################################
+# List a page of report files from start
+##########################################################################
+def list_report_objects_page(object_storage, tenancy, prefix, start):
+    objects = object_storage.list_objects(usage_report_namespace, str(tenancy.id), fields="timeCreated,size,etag", limit=999, prefix=prefix, start=start).data
+    logging.info("   Listed " + str(len(objects.objects)) + " objects of " + prefix + " from " + start)
+    return objects
+
+
+#########################################################################
+# Check if the report file should be loaded
+##########################################################################
+def is_report_file_to_load(object_file, max_file_id, cmd):
+
+    # get file name
+    file_id = object_file.name.rsplit('/', 1)[-1][:-7]
+    file_time = str(object_file.time_created)[0:16]
+
+    # if file already loaded, skip (check if < max_file_id)
+    if str(max_file_id) != "None":
+        if file_id <= str(max_file_id):
+            return False
+
+    # if file id enabled, check
+    if cmd.fileid:
+        if file_id != cmd.fileid:
+            return False
+
+    # check file date
+    if cmd.filedate:
+        if file_time <= cmd.filedate:
+            return False
+
+    return True
+
+
+#########################################################################
+# Load Report Files
+# Download and transform the files in a bounded thread pool, while the
+# rows are inserted and committed one file at a time in file_id order
+# so max(file_id) stays a valid restart point.
+# objects are consumed as they are listed, in file_id order.
+# Each file is handed over in batches of cmd.batch_size rows through a
+# bounded queue, so memory does not grow with the file size
+##########################################################################
+def load_report_files(connection, object_storage, objects, max_file_id, cmd, tenancy, compartments, read_file, load_file, run_summary):
+    num = 0
+    files = (o for o in objects if is_report_file_to_load(o, max_file_id, cmd))
+
+    # keep up to two files per worker downloaded ahead of the database
+    max_ahead = cmd.workers * 2
+    abort = threading.Event()
+    pending = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=cmd.workers) as executor:
+        try:
+            for o in files:
+                batch_queue = queue.Queue(maxsize=2)
+                file_summary = new_report_summary()
+                executor.submit(read_report_batches, read_file, object_storage, o, cmd, tenancy, compartments, file_summary, batch_queue, abort)
+                pending.append((o, batch_queue, file_summary))
+
+                while len(pending) >= max_ahead:
+                    num += load_report_batches(connection, pending.pop(0), cmd, tenancy, load_file, run_summary)
+
+            while pending:
+                num += load_report_batches(connection, pending.pop(0), cmd, tenancy, load_file, run_summary)
+
+        finally:
+            # on error, stop the workers and do not download the files which were not started
+            abort.set()
+
+    return num
+
+
+#########################################################################
+# Transform Report Rows - transform the csv rows of a file in the calling
+# thread, or in chunks of cmd.batch_size rows by the transform process pool,
+# the chunks are returned in the file order so the output stays the same
+##########################################################################
+def transform_report_rows(transform, rows, report, compartments, file_summary, cmd):
+    if transform_pool is None:
+        return transform(rows, report, compartments, file_summary)
+    return transform_report_chunks(transform, rows, report, compartments, file_summary, cmd)
+
+
+def transform_report_chunks(transform, rows, report, compartments, file_summary, cmd):
+    # keep up to two chunks per process in flight for the file
+    max_pending = cmd.processes * 2
+    pending = []
+    compartments_file = get_transform_compartments_file(report[0], compartments)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, cmd.batch_size))
+            if chunk:
+                pending.append(transform_pool.submit(transform_report_chunk, transform, chunk, report, compartments_file))
+
+            while pending and (len(pending) >= max_pending or not chunk):
+                chunk_rows, chunk_summary = pending.pop(0).result()
+                add_chunk_summary(file_summary, chunk_summary)
+                for row_data in chunk_rows:
+                    yield row_data
+
+            if not chunk:
+                return
+
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+#########################################################################
+# Transform Report Chunk - runs in the transform process pool
+# the compartments are read once per process from the file of the tenant
+##########################################################################
+def transform_report_chunk(transform, rows, report, compartments_file):
+    compartments = transform_compartments.get(compartments_file)
+    if compartments is None:
+        with open(compartments_file, 'rb') as f:
+            compartments = pickle.load(f)
+        transform_compartments[compartments_file] = compartments
+
+    chunk_summary = new_report_summary()
+    return list(transform(rows, report, compartments, chunk_summary)), chunk_summary
+
+
+#########################################################################
+# Get Transform Compartments File - the compartments of the tenant are
+# pickled to the work dir on the first chunk of the tenant, so they are
+# not sent with every chunk to the transform processes
+##########################################################################
+def get_transform_compartments_file(tenant_name, compartments):
+    with transform_compartments_lock:
+        compartments_file = transform_compartments_files.get(tenant_name)
+        if compartments_file is None:
+            compartments_file = os.path.join(work_report_dir, "compartments_" + str(os.getpid()) + "_" + str(len(transform_compartments_files)) + ".pkl")
+            with open(compartments_file, 'wb') as f:
+                pickle.dump(compartments, f, pickle.HIGHEST_PROTOCOL)
+            transform_compartments_files[tenant_name] = compartments_file
+    return compartments_file
+
+
+#########################################################################
+# Shutdown Transform Pool - stop the transform processes and remove the
+# compartments files of the tenants
+##########################################################################
+def shutdown_transform_pool():
+    if transform_pool is not None:
+        transform_pool.shutdown()
+
+    with transform_compartments_lock:
+        for compartments_file in transform_compartments_files.values():
+            if os.path.exists(compartments_file):
+                os.remove(compartments_file)
+        transform_compartments_files.clear()
+
+
+#########################################################################
+# Add the summary of a transformed chunk to the file summary
+# usage stats are row counts, cost stats are as kept by add_cost_stats
+##########################################################################
+def add_chunk_summary(file_summary, chunk_summary):
+    add_report_summary(file_summary, chunk_summary)
+    file_summary['rejects'].extend(chunk_summary['rejects'])
+
+    file_stats = file_summary['stats']
+    for usage_interval_start, chunk_stats in chunk_summary['stats'].items():
+        stats = file_stats.get(usage_interval_start)
+        if stats is None:
+            file_stats[usage_interval_start] = chunk_stats
+        elif isinstance(stats, int):
+            file_stats[usage_interval_start] = stats + chunk_stats
+        else:
+            stats[0] += chunk_stats[0]
+            if chunk_stats[1] is not None:
+                stats[1] = chunk_stats[1] + (stats[1] or 0)
+            if chunk_stats[2] is not None:
+                stats[2] = chunk_stats[2] + (stats[2] or 0)
+            if chunk_stats[3] is not None and (stats[3] is None or chunk_stats[3] < stats[3]):
+                stats[3] = chunk_stats[3]
+
+
+#########################################################################
+# Report Summary - values collected while a file is parsed
+# tags_keys  - set of tag keys, the run summary starts with the keys already
+#              in the database, only keys not in it are merged with a file
+# stats      - statistics per USAGE_INTERVAL_START for the stats tables
+# references - distinct (service, compartment name, compartment path,
+#              region, subscription) for OCI_COST_REFERENCE
+# skus       - SKU to min product description for OCI_COST_REFERENCE
+# prices     - SKU to the latest (USAGE_INTERVAL_START, PRD_DESCRIPTION,
+#              COST_CURRENCY_CODE, COST_UNIT_PRICE) for OCI_PRICE_LIST
+# rejects    - (reason, csv row) of the rows with malformed dates or numbers
+# repairs    - SKU to the number of rows with the description from sku_repairs
+# metrics    - time of the stages of the file, see new_file_metrics
+# files      - metrics of the committed files of the run
+##########################################################################
+def new_report_summary():
+    return {'tags_keys': set(), 'stats': {}, 'references': set(), 'skus': {}, 'prices': {}, 'rejects': [], 'repairs': {}, 'metrics': new_file_metrics(), 'files': []}
+
+
+#########################################################################
+# File Metrics - time of the stages of a file load in seconds
+# bytes    - bytes read from Object Storage, not counted on cache hits
+# download - get object and download, or the network reads with --stream
+# parse    - decompress, parse and transform of the rows
+# wait     - time the inserts waited for the rows of the file
+# insert   - inserts of the batches and of the stage table
+# stats    - stats merge and OCI_LOAD_FILES insert
+# commit   - commit of the file
+##########################################################################
+def new_file_metrics():
+    return {'bytes': 0, 'rows': 0, 'download_seconds': 0.0, 'parse_seconds': 0.0, 'wait_seconds': 0.0,
+            'insert_seconds': 0.0, 'stats_seconds': 0.0, 'commit_seconds': 0.0}
+
+
+#########################################################################
+# Get the metrics of a loaded file for the run report
+##########################################################################
+def get_file_metrics(object_file, metrics):
+    file_metrics = {'file_name': object_file.name, 'file_size': object_file.size}
+    for key, value in metrics.items():
+        file_metrics[key] = round(value, 3) if isinstance(value, float) else value
+
+    file_metrics['rows_per_sec'] = round(metrics['rows'] / metrics['parse_seconds'], 1) if metrics['parse_seconds'] > 0 else None
+    file_metrics['mb_per_sec'] = round(metrics['bytes'] / 1024.0 / 1024.0 / metrics['download_seconds'], 2) if metrics['download_seconds'] > 0 else None
+
+    print("   Metrics    file " + object_file.name + " - Download " + str(file_metrics['download_seconds']) + "s, Parse " + str(file_metrics['parse_seconds']) +
+          "s, Insert " + str(file_metrics['insert_seconds']) + "s, Wait " + str(file_metrics['wait_seconds']) + "s, Stats " + str(file_metrics['stats_seconds']) +
+          "s, Commit " + str(file_metrics['commit_seconds']) + "s")
+    logging.info("   Metrics    file " + object_file.name + " - " + json.dumps(file_metrics))
+    return file_metrics
+
+
+#########################################################################
+# Add file summary to the run summary, stats are merged per file
+##########################################################################
+def add_report_summary(run_summary, file_summary):
+    run_summary['tags_keys'].update(file_summary['tags_keys'])
+    run_summary['references'].update(file_summary['references'])
+    for sku, description in file_summary['skus'].items():
+        add_sku_description(run_summary['skus'], sku, description)
+    for sku, price in file_summary['prices'].items():
+        add_cost_price(run_summary['prices'], sku, price)
+    for sku, count in file_summary['repairs'].items():
+        run_summary['repairs'][sku] = run_summary['repairs'].get(sku, 0) + count
+
+
+#########################################################################
+# Read Report Batches - runs in the worker threads
+# put the rows of the file to batch_queue in batches, followed by None
+# at the end of the file, or the exception if the read failed
+##########################################################################
+def read_report_batches(read_file, object_storage, object_file, cmd, tenancy, compartments, file_summary, batch_queue, abort):
+    try:
+        if abort.is_set():
+            return
+
+        # parse time is the read time without the download and the waits for the queue
+        metrics = file_summary['metrics']
+        start_time = time.time()
+        wait_seconds = 0.0
+
+        batch = []
+        for row_data in read_file(object_storage, object_file, cmd, tenancy, compartments, file_summary):
+            batch.append(row_data)
+            if len(batch) >= cmd.batch_size:
+                wait_time = time.time()
+                if not put_report_batch(batch_queue, batch, abort):
+                    return
+                wait_seconds += time.time() - wait_time
+                batch = []
+
+        metrics['parse_seconds'] = time.time() - start_time - wait_seconds - metrics['download_seconds']
+
+        if batch:
+            if not put_report_batch(batch_queue, batch, abort):
+                return
+
+        put_report_batch(batch_queue, None, abort)
+
+    except BaseException as e:
+        put_report_batch(batch_queue, e, abort)
+
+
+#########################################################################
+# Put batch to the queue, give up if the load was aborted
+##########################################################################
+def put_report_batch(batch_queue, batch, abort):
+    while not abort.is_set():
+        try:
+            batch_queue.put(batch, timeout=1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+#########################################################################
+# Get the batches of a file from the queue until the end of the file
+##########################################################################
+def get_report_batches(batch_queue):
+    while True:
+        batch = batch_queue.get()
+        if batch is None:
+            return
+        if isinstance(batch, BaseException):
+            raise batch
+        yield batch
+
+
+#########################################################################
+# Load the batches read by the thread pool for a file to the database
+# the summary of the file is added to run_summary once committed
+##########################################################################
+def load_report_batches(connection, pending_file, cmd, tenancy, load_file, run_summary):
+    o, batch_queue, file_summary = pending_file
+    file_time = str(o.time_created)[0:16]
+
+    print("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
+    logging.info("   Processing file " + o.name + " - " + str(o.size) + " bytes, " + file_time)
+
+    try:
+        num = load_file(connection, o, get_report_batches(batch_queue), file_summary, run_summary['tags_keys'], tenancy, cmd)
+    except BaseException:
+        # discard the batches of the file which were inserted but not committed
+        connection.rollback()
+        raise
+
+    # keep the summary of the committed file for the post load merges
+    add_report_summary(run_summary, file_summary)
+    run_summary['files'].append(get_file_metrics(o, file_summary['metrics']))
+    return num
+
+
+#########################################################################
+# Get process peak resident memory in MB
+##########################################################################
+def get_peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return str(round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1))
+
+
+#########################################################################
+# Run Step - add the seconds of a step to the steps of the run report
+##########################################################################
+@contextlib.contextmanager
+def run_step(steps, name):
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        steps[name] = round(steps.get(name, 0) + time.time() - start_time, 3)
+
+
+#########################################################################
+# Get the totals of the file metrics of a report type
+##########################################################################
+def get_metrics_totals(files):
+    totals = {'files': len(files)}
+    for key in ('file_size', 'bytes', 'rows', 'download_seconds', 'parse_seconds', 'wait_seconds', 'insert_seconds', 'stats_seconds', 'commit_seconds'):
+        totals[key] = round(sum(f[key] for f in files), 3)
+
+    totals['rows_per_sec'] = round(totals['rows'] / totals['parse_seconds'], 1) if totals['parse_seconds'] > 0 else None
+    totals['mb_per_sec'] = round(totals['bytes'] / 1024.0 / 1024.0 / totals['download_seconds'], 2) if totals['download_seconds'] > 0 else None
+    return totals
+
+
+#########################################################################
+# Save Run Report - json file with the steps of the run and of each
+# tenant, and the metrics of the files loaded
+##########################################################################
+def save_run_report(cmd, run_report):
+    try:
+        for tenant_report in run_report['tenants']:
+            tenant_report['usage_totals'] = get_metrics_totals(tenant_report['usage_files'])
+            tenant_report['cost_totals'] = get_metrics_totals(tenant_report['cost_files'])
+
+        if not os.path.exists(cmd.run_report_dir):
+            os.makedirs(cmd.run_report_dir)
+
+        report_filename = os.path.join(cmd.run_report_dir, "run_report_" + run_report['start'].replace(' ', '_').replace(':', '') + ".json")
+        with open(report_filename, 'w') as f:
+            json.dump(run_report, f, indent=1)
+
+        print("\nRun Report saved to " + report_filename)
+        logging.info("Run Report saved to " + report_filename)
+
+    except Exception as e:
+        print("\nError saving run report at save_run_report() - " + str(e))
+
+
+##########################################################################
+# Print the number of cost rows repaired per SKU of a tenant
+##########################################################################
+def print_sku_repairs(tenant_name, repairs):
+    if not repairs:
+        return
+
+    print("   Total " + str(sum(repairs.values())) + " Cost Rows with Missing Product Description Repaired for " + str(tenant_name))
+    logging.info("   Total " + str(sum(repairs.values())) + " Cost Rows with Missing Product Description Repaired for " + str(tenant_name))
+    for sku in sorted(repairs):
+        print("      " + sku + " - " + str(repairs[sku]) + " Rows, " + sku_repairs[sku][0])
+        logging.info("      " + sku + " - " + str(repairs[sku]) + " Rows, " + sku_repairs[sku][0])
+
+
+##########################################################################
+# Get the config profiles of the run, -t can be repeated and/or a
+# profiles file can be given, one profile per line
+##########################################################################
+def get_profiles(cmd):
+    profiles = list(cmd.profiles or [])
+    if cmd.profiles_file:
+        with open(cmd.profiles_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    profiles.append(line)
+
+    # instance principals authenticate a single tenancy, empty is the default profile
+    if cmd.instance_principals or not profiles:
+        return [""]
+
+    return list(dict.fromkeys(profiles))
+
+
+##########################################################################
+# Load Tenant - load the usage and cost reports of a config profile
+# with connections of the shared session pool, usage and cost are loaded
+# by concurrent pipelines, the time of the steps and the metrics of the
+# files are added to run_report
+##########################################################################
+def load_tenant(cmd, profile, pool, run_report):
+    tenant_report = {'profile': profile, 'tenant_name': "", 'steps': {}, 'usage_files': [], 'cost_files': []}
+    run_report['tenants'].append(tenant_report)
+    steps = tenant_report['steps']
+    step_time = time.time()
+
+    config, signer = create_signer(cmd, profile)
 
-    ############################################
-    # Start
-    ############################################
-    print_header("Running Usage Load to ADW", 0)
-    print("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    print("Command Line : " + ' '.join(x for x in sys.argv[1:]))
-    logging.info("Running Usage Load to ADW")
-    logging.info("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    logging.info("Command Line : " + ' '.join(x for x in sys.argv[1:]))
     ############################################
     # Identity extract compartments
     ############################################
-    compartments = []
+    compartments = {}
     tenancy = None
     try:
-        print("\nConnecting to Identity Service...")
-        logging.info("Connecting to Identity Service...")
+        print("\nConnecting to Identity Service" + (" for profile " + profile if profile else "") + "...")
+        logging.info("Connecting to Identity Service" + (" for profile " + profile if profile else "") + "...")
         identity = oci.identity.IdentityClient(config, signer=signer)
         if cmd.proxy:
             identity.base_client.session.proxies = {'https': cmd.proxy}
@@ -1333,57 +3205,54 @@ def main_process():
         logging.info("   Tenant Id   : " + tenancy.id)
         logging.info("   App Version : " + version)
         logging.info("   Home Region : " + tenancy_home_region)
-        logging.info("")  
+        logging.info("")
         # set signer home region
         signer.region = tenancy_home_region
         config['region'] = tenancy_home_region
 
         # Extract compartments
         compartments = identity_read_compartments(identity, tenancy)
+        tenant_report['tenant_name'] = str(tenancy.name)
+        steps['identity'] = round(time.time() - step_time, 3)
 
     except Exception as e:
         print("\nError extracting compartments section - " + str(e) + "\n")
         raise SystemExit
 
     ############################################
-    # connect to database
+    # fetch max file id processed
+    # for usage and cost
     ############################################
     max_usage_file_id = ""
     max_cost_file_id = ""
     connection = None
+    usage_summary = new_report_summary()
+    cost_summary = new_report_summary()
+    tenant_report['usage_files'] = usage_summary['files']
+    tenant_report['cost_files'] = cost_summary['files']
+    tenant_report['sku_repairs'] = cost_summary['repairs']
     try:
-        print("\nConnecting to database " + cmd.dname)
-        logging.info("\nConnecting to database " + cmd.dname)
-        connection = cx_Oracle.connect(user=cmd.duser, password=cmd.dpass, dsn=cmd.dname, encoding="UTF-8", nencoding="UTF-8")
-        cursor = connection.cursor()
-        print("   Connected")
-        logging.info("   Connected")
-        # Check tables structure
-        print("\nChecking Database Structure...")
-        logging.info("\nChecking Database Structure...")
-        check_database_table_structure_usage(connection)
-        check_database_table_structure_cost(connection)
-        check_database_table_structure_price_list(connection, tenancy.name)
-
-        ###############################
-        # fetch max file id processed
-        # for usage and cost
-        ###############################
-        print("\nChecking Last Loaded File...")
-        logging.info("Checking Last Loaded File...")
-        sql = "select nvl(max(file_id),'0') as file_id from OCI_USAGE where to_char(TENANT_NAME)=:tenant_name"
-        cursor.execute(sql, {"tenant_name": str(tenancy.name)})
-        max_usage_file_id, = cursor.fetchone()
-
-        sql = "select nvl(max(file_id),'0') as file_id from OCI_COST where to_char(TENANT_NAME)=:tenant_name"
-        cursor.execute(sql, {"tenant_name": str(tenancy.name)})
-        max_cost_file_id, = cursor.fetchone()
+        connection = pool.acquire()
+
+        print("\nChecking Last Loaded File for " + str(tenancy.name) + "...")
+        logging.info("Checking Last Loaded File for " + str(tenancy.name) + "...")
+
+        # remove the rows of files not completed by a previous backfill, before
+        # the max file id, which is taken from the report table on the first run
+        delete_backfill_report_files(connection, tenancy.name, "USAGE")
+        delete_backfill_report_files(connection, tenancy.name, "COST")
+
+        max_usage_file_id = get_max_loaded_file_id(connection, tenancy.name, "USAGE")
+        max_cost_file_id = get_max_loaded_file_id(connection, tenancy.name, "COST")
+
+        # tag keys already loaded, only new keys will be merged with the files
+        usage_summary['tags_keys'].update(load_tag_keys(connection, "OCI_USAGE_TAG_KEYS", tenancy.name))
+        cost_summary['tags_keys'].update(load_tag_keys(connection, "OCI_COST_TAG_KEYS", tenancy.name))
 
         print("   Max Usage File Id Processed = " + str(max_usage_file_id))
         print("   Max Cost  File Id Processed = " + str(max_cost_file_id))
         logging.info("   Max Usage File Id Processed = " + str(max_usage_file_id))
         logging.info("   Max Cost  File Id Processed = " + str(max_cost_file_id))
-        cursor.close()
 
     except cx_Oracle.DatabaseError as e:
         print("\nError manipulating database - " + str(e) + "\n")
@@ -1392,59 +3261,271 @@ def main_process():
     except Exception as e:
         raise Exception("\nError manipulating database - " + str(e))
 
+    finally:
+        # the pipelines use their own connections
+        if connection is not None:
+            connection.close()
+
     ############################################
     # Download Usage, cost and insert to database
+    # the usage and cost reports are loaded by
+    # two concurrent pipelines
     ############################################
+    object_storage = None
     try:
-        print("\nConnecting to Object Storage Service...")
-        logging.info("\nConnecting to Object Storage Service...")
-        object_storage = oci.object_storage.ObjectStorageClient(config, signer=signer)
-        if cmd.proxy:
-            object_storage.base_client.session.proxies = {'https': cmd.proxy}
-        print("   Connected")
-        logging.info("   Connected")
-        #############################
-        # Handle Report Usage
-        #############################
-        print("\nHandling Usage Report...")
-        logging.info("Handling Usage Report...")
+        if cmd.replay_dir:
+            print("\nReplaying report files from " + cmd.replay_dir)
+            logging.info("Replaying report files from " + cmd.replay_dir)
+        else:
+            print("\nConnecting to Object Storage Service...")
+            logging.info("\nConnecting to Object Storage Service...")
+            object_storage = oci.object_storage.ObjectStorageClient(config, signer=signer)
+            if cmd.proxy:
+                object_storage.base_client.session.proxies = {'https': cmd.proxy}
+            print("   Connected")
+            logging.info("   Connected")
+
+    except Exception as e:
+        print("\nError connecting to Object Storage - " + str(e))
+        raise SystemExit
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        usage_future = executor.submit(load_usage_pipeline, cmd, pool, object_storage, tenancy, compartments, max_usage_file_id, usage_summary, steps)
+        cost_future = executor.submit(load_cost_pipeline, cmd, pool, object_storage, tenancy, compartments, max_cost_file_id, cost_summary, steps)
+        concurrent.futures.wait([usage_future, cost_future])
+
+    # the errors of the pipelines are printed by them, the first fails the tenant
+    usage_future.result()
+    cost_future.result()
+
+
+##########################################################################
+# Load Usage Pipeline - load the usage files of a tenant, with its own
+# connection of the session pool, errors are printed and raised
+##########################################################################
+def load_usage_pipeline(cmd, pool, object_storage, tenancy, compartments, max_usage_file_id, usage_summary, steps):
+    connection = None
+    try:
+        connection = pool.acquire()
+
+        print("\nHandling Usage Report for " + str(tenancy.name) + "...")
+        logging.info("Handling Usage Report for " + str(tenancy.name) + "...")
         usage_num = 0
-        objects = object_storage.list_objects(usage_report_namespace, str(tenancy.id), fields="timeCreated,size", limit=999, prefix="reports/usage-csv/", start="reports/usage-csv/" + max_usage_file_id).data
-        for object_file in objects.objects:
-            usage_num += load_usage_file(connection, object_storage, object_file, max_usage_file_id, cmd, tenancy, compartments)
-        print("\n   Total " + str(usage_num) + " Usage Files Loaded")
-        logging.info("Total " + str(usage_num) + " Usage Files Loaded")
-        #############################
-        # Handle Cost Usage
-        #############################
-        print("\nHandling Cost Report...")
+        objects = list_report_objects(object_storage, tenancy, "reports/usage-csv/", max_usage_file_id, cmd)
+        with run_step(steps, 'usage_load'):
+            usage_num += load_report_files(connection, object_storage, objects, max_usage_file_id, cmd, tenancy, compartments, read_usage_file, load_usage_file, usage_summary)
+        print("\n   Total " + str(usage_num) + " Usage Files Loaded for " + str(tenancy.name))
+        logging.info("Total " + str(usage_num) + " Usage Files Loaded for " + str(tenancy.name))
+
+        # oci_usage_stats are merged per file during the load
+        return usage_num
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at load_usage_pipeline() - " + str(e) + "\n")
+        raise SystemExit
+
+    except (Exception, SystemExit) as e:
+        print("\nError Download Usage and insert to database - " + str(e))
+        raise
+
+    finally:
+        if connection is not None:
+            # metrics of the files committed, also if the load stopped
+            if cmd.load_metrics:
+                insert_load_metrics(connection, tenancy.name, "USAGE", usage_summary['files'])
+
+            # Return the connection to the pool
+            connection.close()
+
+
+##########################################################################
+# Load Cost Pipeline - load the cost files of a tenant, merge the
+# references, price list and the public rates of the files loaded,
+# with its own connection of the session pool, errors are printed and raised
+##########################################################################
+def load_cost_pipeline(cmd, pool, object_storage, tenancy, compartments, max_cost_file_id, cost_summary, steps):
+    connection = None
+    try:
+        connection = pool.acquire()
+
+        print("\nHandling Cost Report for " + str(tenancy.name) + "...")
+        logging.info("Handling Cost Report for " + str(tenancy.name) + "...")
         cost_num = 0
-        objects = object_storage.list_objects(usage_report_namespace, str(tenancy.id), fields="timeCreated,size", limit=999, prefix="reports/cost-csv/", start="reports/cost-csv/" + max_cost_file_id).data
-        for object_file in objects.objects:
-            cost_num += load_cost_file(connection, object_storage, object_file, max_cost_file_id, cmd, tenancy, compartments)
-        print("\n   Total " + str(cost_num) + " Cost Files Loaded")
-        logging.info("   Total " + str(cost_num) + " Cost Files Loaded")
-        # Handle Index structure if not exist
-        check_database_index_structure_usage(connection)
-        check_database_index_structure_cost(connection)
-
-        # Update oci_usage_stats and oci_cost_stats if there were files
-        if usage_num > 0:
-            update_usage_stats(connection)
+        objects = list_report_objects(object_storage, tenancy, "reports/cost-csv/", max_cost_file_id, cmd)
+        try:
+            with run_step(steps, 'cost_load'):
+                cost_num += load_report_files(connection, object_storage, objects, max_cost_file_id, cmd, tenancy, compartments, read_cost_file, load_cost_file, cost_summary)
+        finally:
+            # merge the references and prices of the files committed, also if the load stopped
+            with run_step(steps, 'cost_merge'):
+                merge_cost_reference(connection, tenancy.name, cost_summary)
+                merge_price_list(connection, tenancy.name, cost_summary)
+        print("\n   Total " + str(cost_num) + " Cost Files Loaded for " + str(tenancy.name))
+        logging.info("   Total " + str(cost_num) + " Cost Files Loaded for " + str(tenancy.name))
+        print_sku_repairs(tenancy.name, cost_summary['repairs'])
+
+        # oci_cost_stats are merged per file during the load
         if cost_num > 0:
-            update_cost_stats(connection)
-            update_cost_reference(connection)
-            update_price_list(connection)
-            update_public_rates(connection, tenancy.name)
+            with run_step(steps, 'public_rates'):
+                update_public_rates(connection, tenancy.name, cmd.rates_url, cmd.rates_cache, cmd.rates_cache_ttl, cmd.rates_workers)
+        return cost_num
+
+    except cx_Oracle.DatabaseError as e:
+        print("\nError manipulating database at load_cost_pipeline() - " + str(e) + "\n")
+        raise SystemExit
+
+    except (Exception, SystemExit) as e:
+        print("\nError Download Cost and insert to database - " + str(e))
+        raise
+
+    finally:
+        if connection is not None:
+            # metrics of the files committed, also if the load stopped
+            if cmd.load_metrics:
+                insert_load_metrics(connection, tenancy.name, "COST", cost_summary['files'])
+
+            # Return the connection to the pool
+            connection.close()
+
+
+##########################################################################
+# Main
+##########################################################################
+def main_process():
+    global transform_pool
+
+    filename = '/home/opc/oci_usage/logs/logfile_usage2adw_' + str(datetime.datetime.utcnow())
+    logging.basicConfig(level=logging.DEBUG, filename=filename, filemode="a+",
+                        format="%(asctime)-15s %(levelname)-8s %(message)s")
+
+    cmd = set_parser_arguments()
+    if cmd is None:
+        exit()
+    profiles = get_profiles(cmd)
+
+    # the replay dir holds the report files of a single tenancy
+    if cmd.replay_dir and len(profiles) > 1:
+        print_header("--replay-dir loads a single tenancy, specify one profile!!", 0)
+        exit()
+
+    # steps of the run and of the tenants, saved as the run report at the end
+    run_report = {
+        'version': version,
+        'start': str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        'options': {'workers': cmd.workers, 'processes': cmd.processes, 'tenant_workers': cmd.tenant_workers, 'batch_size': cmd.batch_size,
+                    'stream': cmd.stream, 'backfill': cmd.backfill, 'partitioned': cmd.partitioned, 'cache_dir': cmd.cache_dir, 'replay_dir': cmd.replay_dir},
+        'steps': {},
+        'tenants': []
+    }
+    start_time = time.time()
+
+    ############################################
+    # Start
+    ############################################
+    print_header("Running Usage Load to ADW", 0)
+    print("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    print("Command Line : " + ' '.join(x for x in sys.argv[1:]))
+    logging.info("Running Usage Load to ADW")
+    logging.info("Starts at " + str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    logging.info("Command Line : " + ' '.join(x for x in sys.argv[1:]))
 
-        # Close Connection
-        connection.close()
+    ############################################
+    # connect to database, one session pool and
+    # one structure check for all the tenants,
+    # two connections per tenant for the pipelines
+    ############################################
+    pool = None
+    try:
+        print("\nConnecting to database " + cmd.dname)
+        logging.info("\nConnecting to database " + cmd.dname)
+        pool = cx_Oracle.SessionPool(user=cmd.duser, password=cmd.dpass, dsn=cmd.dname, min=1, max=min(cmd.tenant_workers, len(profiles)) * 2 + 1, increment=1,
+                                     threaded=True, encoding="UTF-8", nencoding="UTF-8")
+        connection = pool.acquire()
+        print("   Connected")
+        logging.info("   Connected")
+        # Check tables structure
+        print("\nChecking Database Structure...")
+        logging.info("\nChecking Database Structure...")
+        with run_step(run_report['steps'], 'structure_check'):
+            check_database_table_structure_usage(connection, cmd.partitioned)
+            check_database_table_structure_cost(connection, cmd.partitioned)
+            check_database_table_structure_price_list(connection)
+            check_database_table_structure_load_files(connection)
+            if cmd.load_metrics:
+                check_database_table_structure_load_metrics(connection)
+            check_database_table_structure_sku_repairs(connection)
+
+        # SKU repairs of the file and of OCI_SKU_REPAIRS, the table has the last word
+        if cmd.sku_repairs_file:
+            update_sku_repairs(load_sku_repairs_file(cmd.sku_repairs_file))
+        update_sku_repairs(load_sku_repairs(connection))
+        print("   " + str(len(sku_repairs)) + " SKU Repairs loaded")
+        logging.info("   " + str(len(sku_repairs)) + " SKU Repairs loaded")
+
+        # backfill - direct path insert without index maintenance
+        if cmd.backfill:
+            prepare_backfill(connection, "OCI_USAGE")
+            prepare_backfill(connection, "OCI_COST")
+
+        pool.release(connection)
 
     except cx_Oracle.DatabaseError as e:
         print("\nError manipulating database - " + str(e) + "\n")
+        raise SystemExit
 
     except Exception as e:
-        print("\nError Download Usage and insert to database - " + str(e))
+        raise Exception("\nError manipulating database - " + str(e))
+
+    # spawned processes do not inherit the locks of the worker threads nor the sku repairs
+    if cmd.processes > 0:
+        transform_pool = concurrent.futures.ProcessPoolExecutor(max_workers=cmd.processes, mp_context=multiprocessing.get_context("spawn"),
+                                                                initializer=update_sku_repairs, initargs=(sku_repairs,))
+
+    # the transform processes are stopped also if a tenant load was interrupted
+    try:
+        ############################################
+        # Load the tenants concurrently
+        ############################################
+        print("\nLoading " + str(len(profiles)) + " Tenant(s), " + str(min(cmd.tenant_workers, len(profiles))) + " concurrently")
+        logging.info("Loading " + str(len(profiles)) + " Tenant(s), " + str(min(cmd.tenant_workers, len(profiles))) + " concurrently")
+        with run_step(run_report['steps'], 'tenants'), concurrent.futures.ThreadPoolExecutor(max_workers=cmd.tenant_workers) as executor:
+            futures = [(profile, executor.submit(load_tenant, cmd, profile, pool, run_report)) for profile in profiles]
+            for profile, future in futures:
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    # the error was printed by the tenant, continue with the others
+                    print("\nError loading tenant profile " + (profile or "DEFAULT") + " - " + str(e))
+                    logging.info("Error loading tenant profile " + (profile or "DEFAULT") + " - " + str(e))
+
+        ############################################
+        # Handle Index structure if not exist,
+        # rebuild after backfill
+        ############################################
+        try:
+            connection = pool.acquire()
+            with run_step(run_report['steps'], 'index_check'):
+                check_database_index_structure_usage(connection)
+                check_database_index_structure_cost(connection)
+            pool.release(connection)
+            pool.close()
+
+        except cx_Oracle.DatabaseError as e:
+            print("\nError manipulating database - " + str(e) + "\n")
+
+        except Exception as e:
+            print("\nError checking index structure - " + str(e))
+
+    finally:
+        shutdown_transform_pool()
+
+    ############################################
+    # save run report
+    ############################################
+    run_report['end'] = str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    run_report['seconds'] = round(time.time() - start_time, 3)
+    if cmd.run_report_dir:
+        save_run_report(cmd, run_report)
 
     ############################################
     # print completed
@@ -1455,4 +3536,5 @@ def main_process():
 ##########################################################################
 # Execute Main Process
 ##########################################################################
-main_process()
+if __name__ == "__main__":
+    collector_profiler.run_profiled(main_process, "usage2adw", threaded=True)
@@ -10,6 +10,7 @@ import pytz
 import logging
 from oci.secrets import SecretsClient
 import base64
+import collector_profiler
 
 os.putenv("TNS_ADMIN", "/home/opc/wallet/Wallet_ADWshared")
 
@@ -86,6 +87,7 @@ def set_parser_arguments():
     parser.add_argument('-du', default="", dest='duser', help='ADB User')
     parser.add_argument('-dp', default="", dest='dpass', help='ADB Password')
     parser.add_argument('-dn', default="", dest='dname', help='ADB Name')
+    collector_profiler.add_profiler_arguments(parser)
     
 
     result = parser.parse_args()
@@ -298,4 +300,4 @@ def main_process():
 ##########################################################################
 # Execute Main Process
 ##########################################################################
-main_process()
+collector_profiler.run_profiled(main_process, "users2adw")